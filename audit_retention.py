@@ -0,0 +1,116 @@
+import os
+import re
+import sys
+import gzip
+import argparse
+import datetime
+
+import psycopg2
+
+import db_connection
+
+# ====================================================================
+#   AUDIT LOG RETENTION AND ARCHIVAL
+# ====================================================================
+# Student_Audit_Log is partitioned by month (migrations/004). Run this
+# daily (cron / Task Scheduler). It:
+#   1. creates the partitions for the coming months, so new entries never
+#      pile up in the default partition;
+#   2. detaches every monthly partition older than --keep-months;
+#   3. copies each detached partition to <archive-dir>/<partition>.csv.gz
+#      and drops it once the archive is complete.
+# A partition whose archive failed stays detached and is picked up again
+# by the next run.
+#
+#   python audit_retention.py --keep-months 12 --archive-dir audit_archive
+
+PARTITION_RE = re.compile(r"^student_audit_log_y(\d{4})m(\d{2})$")
+
+
+def month_start(months_back, today=None):
+    today = today or datetime.date.today()
+    n = today.year * 12 + today.month - 1 - months_back
+    return datetime.date(n // 12, n % 12 + 1, 1)
+
+
+def monthly_partitions(cur):
+    # (name, first day of month, still attached) for every monthly audit table, oldest first
+    cur.execute("""SELECT c.relname, c.relispartition FROM pg_class c
+                   WHERE c.relkind = 'r' AND c.relname LIKE 'student\\_audit\\_log\\_y%'
+                     AND c.relnamespace = 'public'::regnamespace""")
+    found = []
+    for name, attached in cur.fetchall():
+        m = PARTITION_RE.match(name)
+        if m: found.append((name, datetime.date(int(m.group(1)), int(m.group(2)), 1), attached))
+    return sorted(found, key=lambda p: p[1])
+
+
+def archive_partition(conn, name, directory):
+    # COPY the table into a gzip file; written under a temporary name so a partial file never looks complete
+    path = os.path.join(directory, name + ".csv.gz")
+    cur = conn.cursor()
+    with gzip.open(path + ".part", "wt", encoding="utf-8", newline="") as f:
+        cur.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', f)
+    copied = cur.rowcount
+    cur.execute(f'SELECT COUNT(*) FROM "{name}"')
+    if cur.fetchone()[0] != copied:
+        raise RuntimeError(f"{name}: archive row count does not match the table")
+    os.replace(path + ".part", path)
+    cur.execute(f'DROP TABLE "{name}"')
+    conn.commit()
+    return path, copied
+
+
+def run(conn, keep_months, directory, months_ahead=3, dry_run=False, log=print):
+    cur = conn.cursor()
+    if not dry_run:
+        cur.execute("SELECT ensure_audit_partitions(CURRENT_DATE, %s)", (months_ahead,))
+        created = cur.fetchone()[0]
+        conn.commit()
+        if created: log(f"created {created} partition(s)")
+    # Keep the current month plus the keep_months - 1 before it
+    cutoff = month_start(keep_months - 1)
+    expired = [(name, attached) for name, month, attached in monthly_partitions(cur) if month < cutoff]
+    if dry_run:
+        for name, attached in expired: log(f"would archive {name}" + ("" if attached else " (already detached)"))
+        conn.rollback()
+        return []
+    os.makedirs(directory, exist_ok=True)
+    archived = []
+    for name, attached in expired:
+        if attached:
+            cur.execute(f'ALTER TABLE Student_Audit_Log DETACH PARTITION "{name}"')
+            conn.commit()
+        path, rows = archive_partition(conn, name, directory)
+        log(f"archived {name}: {rows} row(s) -> {path}")
+        archived.append(name)
+    return archived
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Create upcoming audit log partitions and archive the expired ones.")
+    ap.add_argument("--keep-months", type=int, default=12, help="months of audit history kept in the database (default 12)")
+    ap.add_argument("--archive-dir", default="audit_archive", help="where compressed partitions are written")
+    ap.add_argument("--months-ahead", type=int, default=3, help="future partitions to create (default 3)")
+    ap.add_argument("--dry-run", action="store_true", help="only list what would be archived")
+    args = ap.parse_args(argv)
+    if args.keep_months < 1: ap.error("--keep-months must be at least 1")
+    try:
+        conn = psycopg2.connect(**db_connection.connect_params(db_connection.load_config()))
+    except psycopg2.Error as e:
+        print(f"Error connecting to DB: {e}", file=sys.stderr)
+        return 2
+    try:
+        archived = run(conn, args.keep_months, args.archive_dir, args.months_ahead, args.dry_run)
+        if not args.dry_run: print(f"{len(archived)} partition(s) archived.")
+        return 0
+    except (psycopg2.Error, OSError, RuntimeError) as e:
+        conn.rollback()
+        print(f"Retention failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import os
+import sys
+import csv
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import psycopg2
+
+import db_connection
+import queries
+
+# ====================================================================
+#   HEADLESS BATCH RUNNER (nightly / end-of-term jobs)
+# ====================================================================
+# Runs the jobs of the Results Processing and Reports tabs without Tk:
+#   results          refresh_results(), then the snapshot of every department
+#   failing          averages below the course's pass mark, per department
+#   resit            failing averages of at least 5, per department
+#   excluded         students with 3+ absences / lates in a course
+#   refresh-mv       REFRESH MATERIALIZED VIEW instructor_reservation_mv
+#   check-summary    compare Student_Course_Summary with Marks / Attendance
+#   rebuild-summary  recompute Student_Course_Summary (not part of 'all')
+# failing / resit / excluded read Student_Course_Summary (migrations/006).
+# Per-department exports are spread over a process pool. Every worker
+# opens one connection, PREPAREs the report queries once and runs them
+# for each department it is given. Each job writes <out>/<job>.csv.
+#
+#   python batch_runner.py all --out reports/
+#   python batch_runner.py results failing --departments 1,4 --workers 4
+#   python batch_runner.py rebuild-summary check-summary
+#
+# Exit status: 0 all jobs succeeded, 1 a job (or a department of it)
+# failed, 2 the database could not be reached.
+
+DEPARTMENT_JOBS = ("results", "failing", "resit", "excluded")
+JOBS = DEPARTMENT_JOBS + ("refresh-mv", "check-summary", "rebuild-summary")
+# The rebuild blocks writes to Marks / Attendance while it runs, so it is only done when asked for
+ALL_JOBS = tuple(j for j in JOBS if j != "rebuild-summary")
+
+EXIT_OK, EXIT_FAILED, EXIT_NO_DB = 0, 1, 2
+
+# --- worker process state (one connection per worker) ---
+_conn = None
+
+
+def _init_worker(params):
+    global _conn
+    _conn = psycopg2.connect(**params)
+    _conn.set_session(readonly=True)
+    cur = _conn.cursor()
+    for job, sql in queries.DEPARTMENT_REPORTS.items():
+        cur.execute(f"PREPARE report_{job}(INTEGER) AS {sql}")
+    _conn.commit()
+
+
+def _export_department(job, department_id, path):
+    # Runs one prepared report for one department and writes it to `path`; returns the row count
+    started = time.perf_counter()
+    cur = _conn.cursor()
+    try:
+        cur.execute(f"EXECUTE report_{job}(%s)", (department_id,))
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow([d[0] for d in cur.description])
+            n = 0
+            while True:
+                rows = cur.fetchmany(5000)
+                if not rows: break
+                w.writerows(rows)
+                n += len(rows)
+    finally:
+        _conn.rollback()
+    return n, time.perf_counter() - started
+
+
+def _merge(parts, path):
+    # Concatenates the per-department files (already in department order), keeping one header
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        for i, part in enumerate(parts):
+            with open(part, encoding="utf-8") as f:
+                header = f.readline()
+                if i == 0: out.write(header)
+                for line in f: out.write(line)
+            os.remove(part)
+
+
+def departments(conn, only=None):
+    cur = conn.cursor()
+    cur.execute("SELECT department_id FROM Department ORDER BY department_id")
+    ids = [r[0] for r in cur.fetchall()]
+    conn.rollback()
+    return [d for d in ids if only is None or d in only]
+
+
+def run_department_jobs(params, jobs, depts, out_dir, workers, log=print):
+    """Exports every job for every department in parallel; returns {job: (rows, failed departments)}."""
+    os.makedirs(out_dir, exist_ok=True)
+    parts = {job: {d: os.path.join(out_dir, f".{job}.{d}.part") for d in depts} for job in jobs}
+    rows = {job: 0 for job in jobs}
+    failed = {job: [] for job in jobs}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(params,)) as pool:
+        futures = {pool.submit(_export_department, job, d, parts[job][d]): (job, d) for job in jobs for d in depts}
+        for fut in as_completed(futures):
+            job, d = futures[fut]
+            try:
+                n, seconds = fut.result()
+                rows[job] += n
+                log(f"  {job:9} department {d:<6} {n:>9,} rows  {seconds:7.2f} s")
+            except Exception as e:
+                failed[job].append(d)
+                log(f"  {job:9} department {d:<6} FAILED: {e}")
+    summary = {}
+    for job in jobs:
+        done = [parts[job][d] for d in depts if d not in failed[job]]
+        if done: _merge(done, os.path.join(out_dir, f"{job}.csv"))
+        for d in failed[job]:
+            if os.path.exists(parts[job][d]): os.remove(parts[job][d])
+        summary[job] = (rows[job], failed[job])
+    return summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run deliberation and report jobs without the GUI.")
+    ap.add_argument("jobs", nargs="+", choices=JOBS + ("all",), help="jobs to run ('all' = every job but rebuild-summary)")
+    ap.add_argument("--out", default="reports", help="output directory (default: reports)")
+    ap.add_argument("--departments", help="comma-separated department ids (default: all)")
+    ap.add_argument("--workers", type=int, default=min(os.cpu_count() or 2, 8), help="worker processes")
+    ap.add_argument("--full", action="store_true", help="results: recompute every result instead of only the changed ones")
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args(argv)
+    log = (lambda *_: None) if args.quiet else print
+    jobs = list(dict.fromkeys(j for name in args.jobs for j in (ALL_JOBS if name == "all" else (name,))))
+    try:
+        only = {int(d) for d in args.departments.split(",")} if args.departments else None
+    except ValueError:
+        ap.error("--departments takes comma-separated numbers")
+
+    params = db_connection.connect_params(db_connection.load_config())
+    try:
+        conn = psycopg2.connect(**params)
+    except psycopg2.Error as e:
+        print(f"Error connecting to DB: {e}", file=sys.stderr)
+        return EXIT_NO_DB
+    status = EXIT_OK
+    started = time.perf_counter()
+    try:
+        # Whole-database steps run here, once, before the per-department exports that depend on them
+        if "rebuild-summary" in jobs:
+            try:
+                n = queries.rebuild_summary(conn)
+                log(f"rebuild-summary: {n} summary row(s) written")
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"rebuild-summary: failed: {e}", file=sys.stderr)
+                status = EXIT_FAILED
+        if "check-summary" in jobs:
+            problems = queries.check_summary(conn)
+            for student, course, dept, problem in problems[:20]:
+                print(f"check-summary: student {student} course {course} department {dept}: {problem}", file=sys.stderr)
+            if problems:
+                print(f"check-summary: {len(problems)} row(s) differ from Marks / Attendance (run rebuild-summary)", file=sys.stderr)
+                status = EXIT_FAILED
+            else:
+                log("check-summary: summary matches Marks / Attendance")
+        if "results" in jobs:
+            try:
+                n = queries.refresh_results(conn, full=args.full)
+                log(f"results: {n} result(s) recomputed")
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"results: refresh failed: {e}", file=sys.stderr)
+                jobs.remove("results"); status = EXIT_FAILED
+        if "refresh-mv" in jobs:
+            try:
+                conn.cursor().execute("REFRESH MATERIALIZED VIEW instructor_reservation_mv")
+                conn.commit()
+                log("refresh-mv: instructor_reservation_mv refreshed")
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"refresh-mv: failed: {e}", file=sys.stderr)
+                status = EXIT_FAILED
+        per_dept = [j for j in jobs if j in DEPARTMENT_JOBS]
+        if per_dept:
+            depts = departments(conn, only)
+            if not depts:
+                print("No matching department.", file=sys.stderr)
+                return EXIT_FAILED
+            log(f"exporting {', '.join(per_dept)} for {len(depts)} department(s) with {args.workers} worker(s)")
+            summary = run_department_jobs(params, per_dept, depts, args.out, max(1, args.workers), log)
+            for job, (rows, failed) in summary.items():
+                log(f"{job}: {rows:,} rows -> {os.path.join(args.out, job + '.csv')}"
+                    + (f"  (failed departments: {', '.join(map(str, sorted(failed)))})" if failed else ""))
+                if failed: status = EXIT_FAILED
+    except psycopg2.Error as e:
+        print(f"Batch failed: {e}", file=sys.stderr)
+        status = EXIT_FAILED
+    finally:
+        conn.close()
+    log(f"finished in {time.perf_counter() - started:.1f} s")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import socket
+import datetime
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+import psycopg2
+
+import db_connection
+import queries
+import bulk_import
+import datagen
+
+# ====================================================================
+#   BENCHMARK SUITE
+# ====================================================================
+# Builds a throwaway database, fills it with datagen.py and times what
+# the application does against it:
+#   load:*    the first page behind every load_* method, and a page
+#             deep into the table (keyset pagination, see paging.py)
+#   report:*  the report functions of the Reports tab
+#   grade:*   proc_grade: refresh_results() plus streaming the snapshot
+#   write:*   bulk writes: CSV import, roll call, weekly room booking
+# Each case runs --repeat times after a warm-up; p50/p95 latency and rows
+# per second (rows returned or written, at the p50 latency) are printed.
+#
+# The throwaway database is created on the configured server and dropped
+# afterwards, or with --initdb in a private cluster (initdb + pg_ctl on a
+# free port) that is removed afterwards.
+#
+#   python benchmark.py --scale 10k
+#   python benchmark.py --scale 100k --output run.json --baseline last_release.json
+#
+# With --baseline, a case whose p50 is more than --tolerance slower than
+# in the baseline counts as a regression and the exit code is 1.
+
+PAGE_SIZE = 500          # rows per page, as in main_app.PAGE_SIZE
+BENCH_MARK_TYPE = "BENCH"
+
+
+# --------------------------------------------------------------------
+#   Throwaway databases
+# --------------------------------------------------------------------
+@contextmanager
+def scratch_database(params, keep=False):
+    admin = psycopg2.connect(**params)
+    admin.autocommit = True
+    name = f"univ_bench_{os.getpid()}"
+    created = False
+    try:
+        cur = admin.cursor()
+        # Never reuse (nor, afterwards, drop) a database this run did not create, e.g. one kept with --keep
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (name,))
+        if cur.fetchone(): raise RuntimeError(f"database {name} already exists; drop it or rerun")
+        cur.execute(f'CREATE DATABASE "{name}" TEMPLATE template0')
+        created = True
+        yield dict(params, database=name)
+    finally:
+        if created and not keep: admin.cursor().execute(f'DROP DATABASE IF EXISTS "{name}"')
+        elif created: print(f"kept database {name}")
+        admin.close()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def private_cluster(pg_bin=None, keep=False):
+    # A new cluster in a temp directory, listening only on a unix socket in that directory
+    def tool(name):
+        path = os.path.join(pg_bin, name) if pg_bin else shutil.which(name)
+        if not path or not os.path.exists(path): raise RuntimeError(f"{name} not found (use --pg-bin)")
+        return path
+    initdb, pg_ctl = tool("initdb"), tool("pg_ctl")
+    root = tempfile.mkdtemp(prefix="univ_bench_")
+    data, port = os.path.join(root, "data"), _free_port()
+    started = False
+    try:
+        subprocess.run([initdb, "-D", data, "-U", "postgres", "--auth=trust", "-E", "UTF8"], check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([pg_ctl, "-D", data, "-l", os.path.join(root, "server.log"), "-w", "start",
+                        "-o", f"-p {port} -k {root} -c listen_addresses=''"], check=True, stdout=subprocess.DEVNULL)
+        started = True
+        yield {"host": root, "port": str(port), "user": "postgres", "password": "", "database": "postgres"}
+    finally:
+        if started: subprocess.run([pg_ctl, "-D", data, "-m", "fast", "-w", "stop"], stdout=subprocess.DEVNULL)
+        if not keep: shutil.rmtree(root, ignore_errors=True)
+        else: print(f"kept cluster in {root}")
+
+
+# --------------------------------------------------------------------
+#   Timing
+# --------------------------------------------------------------------
+def percentile(values, p):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def measure(conn, run, repeat, setup=None, teardown=None):
+    # run(conn) returns the number of rows read or written; the first call is a warm-up
+    times, rows = [], 0
+    for i in range(repeat + 1):
+        if setup: setup(conn)
+        started = time.perf_counter()
+        rows = run(conn)
+        elapsed = time.perf_counter() - started
+        if teardown: teardown(conn)
+        if i: times.append(elapsed)
+    p50 = percentile(times, 50)
+    return {"runs": len(times), "p50_ms": p50 * 1000, "p95_ms": percentile(times, 95) * 1000,
+            "max_ms": max(times) * 1000, "rows": rows, "rows_per_s": rows / p50 if p50 else 0.0}
+
+
+def scalar(conn, sql, params=None):
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    row = cur.fetchone()
+    conn.rollback()
+    return row[0] if row else None
+
+
+def fetch_rows(sql, params=None):
+    def run(conn):
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        n = len(cur.fetchall())
+        conn.rollback()
+        return n
+    return run
+
+
+# --------------------------------------------------------------------
+#   Cases
+# --------------------------------------------------------------------
+def load_cases(conn):
+    cases = []
+    for name, query in queries.TABLES.items():
+        if name == "audit": query = queries.audit_range(datetime.date.today() - datetime.timedelta(days=30), None)
+        cases.append((f"load:{name}", fetch_rows(*query.first(PAGE_SIZE)), None, None))
+        # A page from the middle of the table, reached by key as when scrolling
+        total = scalar(conn, f"SELECT COUNT(*) FROM {query.table}")
+        if total and total > PAGE_SIZE:
+            sql, params = query.select_all()
+            cur = conn.cursor()
+            cur.execute(sql + " OFFSET %s LIMIT 1", params + (total // 2,))
+            row = cur.fetchone(); conn.rollback()
+            if row: cases.append((f"load:{name} (deep page)", fetch_rows(*query.after(query.key_of(row), PAGE_SIZE)), None, None))
+    return cases
+
+
+def report_cases(conn):
+    group = scalar(conn, "SELECT academic_group FROM Student WHERE academic_group IS NOT NULL ORDER BY student_id DESC LIMIT 1")
+    section = scalar(conn, "SELECT section FROM Student WHERE section IS NOT NULL ORDER BY student_id DESC LIMIT 1")
+    return [
+        ("report:get_students_by_group", fetch_rows("SELECT * FROM get_students_by_group(%s)", (group,)), None, None),
+        ("report:get_students_by_section", fetch_rows("SELECT * FROM get_students_by_section(%s)", (section,)), None, None),
+        ("report:get_failing_students", fetch_rows("SELECT * FROM get_failing_students()"), None, None),
+        ("report:get_resit_students", fetch_rows("SELECT * FROM get_resit_students()"), None, None),
+        ("report:get_excluded_students", fetch_rows("SELECT * FROM get_excluded_students()"), None, None),
+    ]
+
+
+def grade_cases(conn, changed=100):
+    def proc_grade(full):
+        def run(conn):
+            queries.refresh_results(conn, full=full)
+            return sum(len(chunk) for chunk in queries.iter_results(conn))
+        return run
+    def touch_marks(conn):
+        # The incremental run recomputes only what changed: update a sample of marks first
+        cur = conn.cursor()
+        cur.execute("""UPDATE Marks SET mark_value = LEAST(20, mark_value + 0.5)
+                       WHERE mark_id IN (SELECT mark_id FROM Marks TABLESAMPLE SYSTEM (1) LIMIT %s)""", (changed,))
+        conn.commit()
+    return [
+        ("grade:proc_grade (full)", proc_grade(True), None, None),
+        (f"grade:proc_grade (incremental, {changed} marks changed)", proc_grade(False), touch_marks, None),
+    ]
+
+
+def write_cases(conn, workdir, csv_rows=10_000):
+    # CSV import of fresh marks, the roll call of one group, a 12-week booking; each undone after timing
+    # by deleting exactly the rows that run inserted (their ids come back from RETURNING)
+    written = {}
+    enrolled = conn.cursor()
+    enrolled.execute("SELECT student_id, course_id, department_id FROM Enrollment ORDER BY student_id DESC LIMIT %s", (csv_rows,))
+    path = os.path.join(workdir, "bench_marks.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("student_id,course_id,department_id,mark_value,mark_type\n")
+        for i, (s, c, d) in enumerate(enrolled.fetchall()):
+            f.write(f"{s},{c},{d},{(i * 7) % 21}.00,{BENCH_MARK_TYPE}\n")
+    conn.rollback()
+    def import_marks(conn):
+        result = bulk_import.import_csv(conn, "Marks", path, returning=("mark_id",))
+        if result["errors"]: raise RuntimeError(f"benchmark CSV rejected: {result['errors'][:3]}")
+        written["marks"] = [r[0] for r in result["rows"]]
+        return result["inserted"]
+    def drop_marks(conn):
+        conn.cursor().execute("DELETE FROM Marks WHERE mark_id = ANY(%s)", (written.pop("marks"),)); conn.commit()
+
+    group = scalar(conn, "SELECT academic_group FROM Student WHERE academic_group IS NOT NULL ORDER BY student_id DESC LIMIT 1")
+    roll = [(sid, "Present") for sid, _, _ in queries.roll_call_students(conn, "group", group)]
+    conn.rollback()
+    course = scalar(conn, "SELECT course_id FROM Course ORDER BY course_id LIMIT 1")
+    day = datetime.date(2099, 1, 5)
+    def roll_call(conn):
+        written["attendance"] = queries.record_roll_call(conn, course, day, roll)
+        return len(written["attendance"])
+    def drop_roll(conn):
+        conn.cursor().execute("DELETE FROM Attendance WHERE attendance_id = ANY(%s)", (written.pop("attendance"),)); conn.commit()
+
+    room = conn.cursor()
+    room.execute("SELECT building, roomno FROM Room ORDER BY capacity DESC, building, roomno LIMIT 1")
+    building, roomno = room.fetchone()
+    room.execute("SELECT course_id, department_id, instructor_id FROM Reservation LIMIT 1")
+    booking = room.fetchone()
+    conn.rollback()
+    def book(conn):
+        written["reservations"] = [r[0] for r in queries.book_weekly(conn, building, roomno, *booking, day, datetime.time(8, 30), datetime.time(10), 12)]
+        return len(written["reservations"])
+    def drop_booking(conn):
+        conn.cursor().execute("DELETE FROM Reservation WHERE reservation_id = ANY(%s)", (written.pop("reservations"),)); conn.commit()
+
+    cases = [(f"write:csv import ({csv_rows} marks)", import_marks, None, drop_marks),
+             (f"write:roll call ({len(roll)} students)", roll_call, None, drop_roll)]
+    if booking: cases.append(("write:weekly booking (12 weeks)", book, None, drop_booking))
+    return cases
+
+
+def run_suite(params, scale, seed, repeat, log=print):
+    conn = psycopg2.connect(**params)
+    try:
+        started = time.perf_counter()
+        datagen.load_schema(conn, log=lambda *_: None)
+        counts = datagen.generate(conn, scale, seed, log=lambda *_: None)
+        log(f"generated {sum(counts.values()):,} rows for {scale:,} students in {time.perf_counter() - started:.1f} s")
+        results = {}
+        with tempfile.TemporaryDirectory() as workdir:
+            cases = load_cases(conn) + report_cases(conn) + grade_cases(conn) + write_cases(conn, workdir)
+            for name, run, setup, teardown in cases:
+                # Whole-table work is slow at large scales: fewer repetitions are enough there
+                n = max(3, repeat // 4) if name.startswith(("grade:", "write:csv")) else repeat
+                results[name] = measure(conn, run, n, setup, teardown)
+                r = results[name]
+                log(f"{name:58} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  {r['rows']:>9,} rows  {r['rows_per_s']:>12,.0f} rows/s")
+        return {"scale": scale, "seed": seed, "repeat": repeat, "server": conn.server_version,
+                "started": datetime.datetime.now().isoformat(timespec="seconds"), "results": results}
+    finally:
+        conn.close()
+
+
+def regressions(report, baseline, tolerance):
+    # Cases whose p50 grew by more than `tolerance` (0.2 = 20%) compared with the baseline run
+    slower = []
+    for name, r in report["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if old and old["p50_ms"] > 0 and r["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            slower.append((name, old["p50_ms"], r["p50_ms"]))
+    return slower
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Time the application's queries and writes on a throwaway database filled by datagen.py.")
+    ap.add_argument("--scale", type=datagen.parse_scale, default=datagen.SCALES["10k"], help="number of students: 10k, 100k, 1m or a number")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeat", type=int, default=20, help="timed runs per case (after one warm-up)")
+    ap.add_argument("--initdb", action="store_true", help="run in a private cluster made with initdb instead of the configured server")
+    ap.add_argument("--pg-bin", help="directory holding initdb and pg_ctl (default: PATH)")
+    ap.add_argument("--keep", action="store_true", help="keep the throwaway database / cluster")
+    ap.add_argument("--output", help="write the results as JSON")
+    ap.add_argument("--baseline", help="JSON from an earlier run: fail on p50 regressions")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slow-down against the baseline (default 0.2 = 20%%)")
+    args = ap.parse_args(argv)
+    try:
+        if args.initdb: target = private_cluster(args.pg_bin, args.keep)
+        else: target = scratch_database(db_connection.connect_params(db_connection.load_config()), args.keep)
+        with target as params:
+            report = run_suite(params, args.scale, args.seed, args.repeat)
+    except (psycopg2.Error, RuntimeError, OSError, subprocess.CalledProcessError) as e:
+        print(f"Benchmark failed: {e}", file=sys.stderr)
+        return 2
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f: slower = regressions(report, json.load(f), args.tolerance)
+        for name, old, new in slower: print(f"REGRESSION {name}: p50 {old:.2f} -> {new:.2f} ms")
+        if slower: return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
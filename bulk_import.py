@@ -0,0 +1,206 @@
+import os
+import csv
+
+from psycopg2 import sql
+
+# ====================================================================
+#   BULK CSV IMPORT (COPY ... FROM STDIN through a staging table)
+# ====================================================================
+# 1. the file is streamed into a TEMP table whose columns are all text
+#    (so a bad value never aborts the COPY half-way),
+# 2. every row is validated with set-based queries: types, NOT NULL,
+#    lengths, foreign keys and primary-key duplicates, each error tagged
+#    with its line number,
+# 3. if the file is clean, one INSERT ... SELECT moves it into the real
+#    table, so the statement-level audit triggers fire exactly once.
+# Everything runs in a single transaction: a file goes in whole or not at all.
+
+IMPORTABLE = ("Student", "Enrollment", "Marks", "Attendance")
+
+# Value lists from CHECK constraints, validated per row as well
+ALLOWED_VALUES = {
+    ("attendance", "status"): ("Present", "Absent", "Late", "Excused"),
+}
+
+MAX_ERRORS = 1000
+
+# Used when the server is older than PostgreSQL 16 (no pg_input_is_valid): the cast is tried in
+# its own exception block, so out-of-range numbers, numeric precision / scale and impossible dates
+# are rejected row by row instead of failing the final INSERT
+TRY_CAST_FUNCTION = """
+    CREATE OR REPLACE FUNCTION pg_temp.input_is_valid(p_value TEXT, p_type TEXT) RETURNS BOOLEAN AS $$
+    BEGIN
+        EXECUTE format('SELECT %L::%s', p_value, p_type);
+        RETURN TRUE;
+    EXCEPTION WHEN data_exception THEN
+        RETURN FALSE;
+    END;
+    $$ LANGUAGE plpgsql"""
+
+TEXT_TYPES = ("text", "character varying", "character")
+
+
+class CsvImportError(Exception):
+    pass
+
+
+class _ProgressReader:
+    # File wrapper handed to copy_expert: reports bytes read and honours cancellation
+    def __init__(self, f, total, job, step=1 << 20):
+        self.f, self.total, self.job, self.step = f, total, job, step
+        self.done, self._next = 0, step
+
+    def _count(self, data):
+        self.done += len(data)
+        if self.done >= self._next:
+            self._next = self.done + self.step
+            if self.job:
+                self.job.check()
+                self.job.progress((self.done, self.total))
+        return data
+
+    def read(self, size=-1): return self._count(self.f.read(size))
+    def readline(self, size=-1): return self._count(self.f.readline(size))
+
+
+def table_columns(cur, table):
+    cur.execute("""SELECT a.attname, format_type(a.atttypid, a.atttypmod), a.attnotnull, a.atthasdef,
+                          CASE WHEN a.atttypmod > 4 AND t.typname IN ('varchar', 'bpchar') THEN a.atttypmod - 4 END
+                   FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid
+                   WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+                   ORDER BY a.attnum""", (table,))
+    return {name: {"type": typ, "notnull": notnull, "default": hasdef, "maxlen": maxlen}
+            for name, typ, notnull, hasdef, maxlen in cur.fetchall()}
+
+
+def table_keys(cur, table):
+    # Primary key and foreign keys straight from the catalog: [(kind, ref_table, [cols], [ref_cols])]
+    cur.execute("""SELECT c.contype, c.confrelid::regclass::text,
+                          ARRAY(SELECT a.attname FROM unnest(c.conkey) WITH ORDINALITY k(n, i)
+                                JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.n ORDER BY k.i),
+                          ARRAY(SELECT a.attname FROM unnest(c.confkey) WITH ORDINALITY k(n, i)
+                                JOIN pg_attribute a ON a.attrelid = c.confrelid AND a.attnum = k.n ORDER BY k.i)
+                   FROM pg_constraint c
+                   WHERE c.conrelid = %s::regclass AND c.contype IN ('p', 'f')""", (table,))
+    return cur.fetchall()
+
+
+def read_header(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), None)
+    if not header: raise CsvImportError("The file is empty.")
+    return [h.strip().lower() for h in header]
+
+
+def _validity(col, info, pg16):
+    # SQL condition that is TRUE when the staged text value can be stored in the column
+    ident = sql.Identifier(col)
+    if pg16:
+        return sql.SQL("pg_input_is_valid({}, {})").format(ident, sql.Literal(info["type"]))
+    # An explicit cast to varchar(n) truncates instead of failing, so lengths are compared directly
+    if info["maxlen"]:
+        return sql.SQL("char_length({}) <= {}").format(ident, sql.Literal(info["maxlen"]))
+    if info["type"].split("(")[0] in TEXT_TYPES:
+        return sql.SQL("TRUE")
+    return sql.SQL("pg_temp.input_is_valid({}, {})").format(ident, sql.Literal(info["type"]))
+
+
+def _cast(col, info, alias="s"):
+    return sql.SQL("{}.{}::{}").format(sql.Identifier(alias), sql.Identifier(col), sql.SQL(info["type"]))
+
+
+def _collect(cur, checks):
+    if not checks: return []
+    query = sql.SQL(" UNION ALL ").join(checks) + sql.SQL(" ORDER BY 1 LIMIT {}").format(sql.Literal(MAX_ERRORS))
+    cur.execute(query)
+    return [(line + 1, msg) for line, msg in cur.fetchall()]   # +1: the header is line 1
+
+
+def import_csv(conn, table, path, job=None, returning=()):
+    """Loads a CSV file (with a header row) into `table`. Returns {"inserted": n, "errors": [(line, message)]},
+    plus "rows": the values of the `returning` columns for every inserted row when any are asked for."""
+    if table not in IMPORTABLE: raise CsvImportError(f"Import into {table} is not supported.")
+    target = table.lower()
+    header = read_header(path)
+    cur = conn.cursor()
+    columns = table_columns(cur, target)
+
+    unknown = [h for h in header if h not in columns]
+    if unknown: raise CsvImportError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+    if len(set(header)) != len(header): raise CsvImportError("The header contains duplicate columns.")
+    missing = [c for c, i in columns.items() if i["notnull"] and not i["default"] and c not in header]
+    if missing: raise CsvImportError(f"Required column(s) missing from the file: {', '.join(missing)}")
+
+    # 1. Stream the file into an all-text staging table
+    stage = sql.Identifier("stage_" + target)
+    cur.execute(sql.SQL("CREATE TEMP TABLE {} (line_no BIGSERIAL, {}) ON COMMIT DROP").format(
+        stage, sql.SQL(", ").join(sql.SQL("{} TEXT").format(sql.Identifier(c)) for c in header)))
+    copy = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, HEADER true)").format(
+        stage, sql.SQL(", ").join(map(sql.Identifier, header)))
+    total = os.path.getsize(path)
+    with open(path, "rb") as f:
+        cur.copy_expert(copy.as_string(conn), _ProgressReader(f, total, job))
+    if job: job.progress((total, total))
+    cur.execute(sql.SQL("ANALYZE {}").format(stage))
+
+    # 2a. Per-value checks: required, type/length, allowed values
+    pg16 = conn.server_version >= 160000
+    if not pg16: cur.execute(TRY_CAST_FUNCTION)
+    checks = []
+    for col in header:
+        info, ident = columns[col], sql.Identifier(col)
+        if info["notnull"]:
+            checks.append(sql.SQL("SELECT line_no, {} FROM {} WHERE {} IS NULL").format(
+                sql.Literal(f"{col} is required"), stage, ident))
+        checks.append(sql.SQL("SELECT line_no, {} || {} || {} FROM {} WHERE {} IS NOT NULL AND NOT ({})").format(
+            sql.Literal(f"{col}: '"), ident, sql.Literal(f"' is not a valid {info['type']}"), stage, ident, _validity(col, info, pg16)))
+        allowed = ALLOWED_VALUES.get((target, col))
+        if allowed:
+            checks.append(sql.SQL("SELECT line_no, {} || {} || {} FROM {} WHERE {} IS NOT NULL AND {} <> ALL({})").format(
+                sql.Literal(f"{col}: '"), ident, sql.Literal(f"' must be one of {', '.join(allowed)}"), stage, ident, ident, sql.Literal(list(allowed))))
+    errors = _collect(cur, checks)
+
+    # 2b. Key checks (only once every value casts cleanly)
+    if not errors:
+        checks = []
+        for kind, ref, cols, ref_cols in table_keys(cur, target):
+            if not set(cols) <= set(header): continue   # e.g. SERIAL mark_id left to its default
+            casts = [_cast(c, columns[c]) for c in cols]
+            present = sql.SQL(" AND ").join(sql.SQL("s.{} IS NOT NULL").format(sql.Identifier(c)) for c in cols)
+            if kind == "f":
+                match = sql.SQL(" AND ").join(sql.SQL("r.{} = {}").format(sql.Identifier(rc), cast) for rc, cast in zip(ref_cols, casts))
+                checks.append(sql.SQL("SELECT s.line_no, {} FROM {} s WHERE {} AND NOT EXISTS (SELECT 1 FROM {} r WHERE {})").format(
+                    sql.Literal(f"{', '.join(cols)} not found in {ref}"), stage, present, sql.Identifier(ref), match))
+            else:
+                key = sql.SQL(", ").join(casts)
+                checks.append(sql.SQL("SELECT line_no, {} FROM (SELECT s.line_no, row_number() OVER (PARTITION BY {} ORDER BY s.line_no) AS n FROM {} s) d WHERE n > 1").format(
+                    sql.Literal(f"duplicate {', '.join(cols)} within the file"), key, stage))
+                match = sql.SQL(" AND ").join(sql.SQL("t.{} = {}").format(sql.Identifier(c), cast) for c, cast in zip(cols, casts))
+                checks.append(sql.SQL("SELECT s.line_no, {} FROM {} s WHERE EXISTS (SELECT 1 FROM {} t WHERE {})").format(
+                    sql.Literal(f"{', '.join(cols)} already exists in {table}"), stage, sql.Identifier(target), match))
+        errors = _collect(cur, checks)
+
+    if errors:
+        conn.rollback()
+        return {"inserted": 0, "errors": errors, "rows": []}
+
+    # 3. One set-based insert (one audit trigger firing), then commit the whole file
+    if job: job.check()
+    insert = sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {} s ORDER BY s.line_no").format(
+        sql.Identifier(target), sql.SQL(", ").join(map(sql.Identifier, header)),
+        sql.SQL(", ").join(_cast(c, columns[c]) for c in header), stage)
+    if returning: insert += sql.SQL(" RETURNING {}").format(sql.SQL(", ").join(map(sql.Identifier, returning)))
+    cur.execute(insert)
+    inserted = cur.rowcount
+    rows = cur.fetchall() if returning else []
+    conn.commit()
+    return {"inserted": inserted, "errors": [], "rows": rows}
+
+
+def write_error_report(path, errors):
+    out = os.path.splitext(path)[0] + ".errors.csv"
+    with open(out, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["line", "error"])
+        w.writerows(errors)
+    return out
@@ -0,0 +1,166 @@
+import re
+import sys
+import json
+import fnmatch
+import argparse
+import datetime
+
+import psycopg2
+
+import db_connection
+import queries
+
+# ====================================================================
+#   INDEX USAGE CHECK (EXPLAIN (ANALYZE, BUFFERS))
+# ====================================================================
+# Runs the query behind every report / hot lookup under EXPLAIN ANALYZE
+# and confirms the plan reads it through the expected index (see
+# migrations/002_index_pack.sql). Functions are checked through their
+# installed body, so a check always follows the current definition:
+# find_free_rooms() is inlined by the planner and explained as called;
+# for the others (PL/pgSQL, whose plans EXPLAIN cannot see into, and
+# check_reservation_conflict(), whose sub-select prevents inlining) the
+# query is read from pg_proc and explained with its arguments bound.
+#
+# On a small table the planner rightly prefers a sequential scan. A check
+# that fails is therefore repeated with enable_seqscan = off: if the index
+# is used then, it is reported as "usable" (fine now, will be picked up as
+# the table grows); only an index that cannot be used at all fails.
+
+RETURN_QUERY_RE = re.compile(r"\bRETURN\s+QUERY\s+(.*?);", re.IGNORECASE | re.DOTALL)
+
+
+class Function(str):
+    """Name of a function checked through its installed body: the whole query (SQL) or its RETURN QUERY (PL/pgSQL)."""
+
+
+def function_query(conn, name):
+    # (sql with %s placeholders, argument index of each placeholder), or None when there is nothing to check
+    cur = conn.cursor()
+    cur.execute("""SELECT p.prosrc, p.proargnames, p.pronargs, l.lanname
+                   FROM pg_proc p JOIN pg_language l ON l.oid = p.prolang WHERE p.proname = %s""", (name.lower(),))
+    row = cur.fetchone()
+    conn.rollback()
+    if row is None: return None
+    if row[3] == "sql": body = row[0].strip().rstrip(";")
+    else:
+        m = RETURN_QUERY_RE.search(row[0])
+        if m is None: return None
+        body = m.group(1)
+    args = list(row[1] or [])[:row[2]]
+    order = []
+    def bind(m):
+        order.append(args.index(m.group(1)) if m.group(1) else int(m.group(2)) - 1)
+        return "%s"
+    sql = body.replace("%", "%%")
+    if args: sql = re.sub(r"\b(" + "|".join(map(re.escape, args)) + r")\b|\$(\d+)", bind, sql)
+    return sql, order
+
+
+# (name, query or Function, parameters or a query returning sample parameters, expected indexes)
+CHECKS = [
+    ("(a) students by group", Function("get_students_by_group"),
+     "SELECT academic_group FROM Student WHERE academic_group IS NOT NULL LIMIT 1",
+     ["idx_student_group"]),
+    ("(b) students by section", Function("get_students_by_section"),
+     "SELECT section FROM Student WHERE section IS NOT NULL LIMIT 1",
+     ["idx_student_section"]),
+    # migrations/006: the report functions read Student_Course_Summary
+    ("(h) failing students", Function("get_failing_students"), None, ["idx_summary_failing"]),
+    ("(i) resit students", Function("get_resit_students"), None, ["idx_summary_failing"]),
+    ("(j) excluded students", Function("get_excluded_students"), None, ["idx_summary_excluded"]),
+    ("(h) failing by department",
+     queries.DEPARTMENT_REPORTS["failing"].replace("$1", "%s"),
+     "SELECT department_id FROM Student_Course_Summary LIMIT 1",
+     ["idx_summary_failing"]),
+    # migrations/005: the exclusion constraint's GiST index, or the room/date index without btree_gist
+    ("reservation conflict", Function("check_reservation_conflict"),
+     "SELECT building, roomno, reserv_date, start_time, end_time FROM Reservation LIMIT 1",
+     ["ex_reservation_room_time", "idx_reservation_room_date"]),
+    ("free rooms", "SELECT * FROM find_free_rooms(%s, %s, %s)",
+     "SELECT reserv_date, start_time, end_time FROM Reservation LIMIT 1",
+     ["ex_reservation_room_time", "idx_reservation_room_date"]),
+    # The audit log is partitioned (migrations/004): plans name the per-partition indexes
+    ("audit log (newest page)",
+     *queries.TABLES["audit"].first(500),
+     ["student_audit_log_*_pkey"]),
+    ("audit log by date range",
+     *queries.audit_range(datetime.date.today() - datetime.timedelta(days=30), datetime.date.today()).first(500),
+     ["student_audit_log_*_pkey", "student_audit_log_*_audit_timestamp_idx"]),
+]
+
+
+def plan_indexes(plan):
+    # Every (node type, index name) in the plan tree
+    found = []
+    if "Index Name" in plan: found.append((plan["Node Type"], plan["Index Name"]))
+    for child in plan.get("Plans", []): found.extend(plan_indexes(child))
+    return found
+
+
+def uses_expected(used, expected):
+    # Expected names may be patterns, e.g. the same index on every partition
+    return any(fnmatch.fnmatchcase(ix, pattern) for ix in used for pattern in expected)
+
+
+def explain(conn, sql, params, seqscan=True):
+    cur = conn.cursor()
+    try:
+        if not seqscan: cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        out = cur.fetchone()[0]
+        return out[0] if isinstance(out, list) else json.loads(out)[0]
+    finally:
+        conn.rollback()
+
+
+def run_checks(conn):
+    results = []
+    for name, sql, sample, expected in CHECKS:
+        params = sample if isinstance(sample, tuple) else None
+        if isinstance(sample, str):
+            cur = conn.cursor(); cur.execute(sample); params = cur.fetchone(); conn.rollback()
+            if params is None:
+                results.append((name, "SKIP", "no sample data", None)); continue
+        if isinstance(sql, Function):
+            found = function_query(conn, sql)
+            if found is None:
+                results.append((name, "FAIL", f"no RETURN QUERY found in {sql}()", expected)); continue
+            sql, order = found
+            params = tuple(params[i] for i in order) if params else None
+        status = "OK"
+        result = explain(conn, sql, params)
+        used = [ix for _, ix in plan_indexes(result["Plan"])]
+        if not uses_expected(used, expected):
+            status = "USABLE"
+            result = explain(conn, sql, params, seqscan=False)
+            used = [ix for _, ix in plan_indexes(result["Plan"])]
+            if not uses_expected(used, expected): status = "FAIL"
+        plan = result["Plan"]
+        detail = (f"{', '.join(sorted(set(used))) or 'no index'}; {result['Execution Time']:.2f} ms; "
+                  f"buffers hit={plan.get('Shared Hit Blocks', 0)} read={plan.get('Shared Read Blocks', 0)}")
+        results.append((name, status, detail, expected))
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Check that every report uses its index (EXPLAIN ANALYZE, BUFFERS).")
+    ap.add_argument("--strict", action="store_true", help="also fail when an index is only used with seq scans disabled")
+    args = ap.parse_args(argv)
+    try:
+        conn = psycopg2.connect(**db_connection.connect_params(db_connection.load_config()))
+    except psycopg2.Error as e:
+        print(f"Error connecting to DB: {e}", file=sys.stderr)
+        return 2
+    try:
+        results = run_checks(conn)
+    finally:
+        conn.close()
+    bad = ("FAIL", "USABLE") if args.strict else ("FAIL",)
+    for name, status, detail, expected in results:
+        print(f"[{status:6}] {name:26} {detail}" + (f"  (expected {', '.join(expected)})" if status in bad else ""))
+    return 1 if any(r[1] in bad for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
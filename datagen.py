@@ -0,0 +1,248 @@
+import io
+import os
+import csv
+import sys
+import math
+import random
+import argparse
+import datetime
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import db_connection
+import migrate
+
+# ====================================================================
+#   SYNTHETIC DATA GENERATOR
+# ====================================================================
+# Fills the part1/part2 schema with a realistic, reproducible data set:
+# the same --seed and scale always give the same rows. Every other
+# table is sized from the number of students:
+#   departments  one per 10,000 students (at least 4), each with
+#                4 sections, 12 courses and 10 instructors
+#   groups       30 students each, spread over the sections
+#   rooms        one per 500 students (at least 20)
+#   enrollment   --courses-per-student courses of the student's department
+#   marks        one per mark type (CC, Exam) and enrollment
+#   attendance   --sessions records per enrollment
+#   reservations one weekly session per course over a 12-week term
+# Rows are appended after the existing ones (ids continue from the
+# current maximum) and streamed with COPY, so the statement-level audit
+# triggers fire once per table.
+#
+#   python datagen.py --scale 100k            into the configured database
+#   python datagen.py --scale 10k --schema    load part1/part2 + migrations first
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_FILES = ("part1_final_version.sql", "part2_final_version.sql")
+
+FIRST_NAMES = ["Amine", "Sara", "Yacine", "Lina", "Karim", "Meriem", "Walid", "Imane", "Sofiane", "Nour",
+               "Riad", "Amel", "Nassim", "Ines", "Bilal", "Yasmine", "Hamza", "Rania", "Adel", "Salma"]
+LAST_NAMES = ["Haddad", "Benali", "Mansouri", "Boudiaf", "Cherif", "Saidi", "Meziane", "Brahimi", "Kaci", "Amrani",
+              "Belkacem", "Ziani", "Hamdi", "Rahmani", "Khelifi", "Touati", "Ouali", "Larbi", "Bouzid", "Djebbar"]
+CITIES = [("Algiers", "16000"), ("Oran", "31000"), ("Constantine", "25000"), ("Batna", "05000"),
+          ("Blida", "09000"), ("Setif", "19000"), ("Annaba", "23000"), ("Tlemcen", "13000")]
+RANKS = ["Substitute", "MCB", "MCA", "PROF"]
+MARK_TYPES = (("CC", 40), ("Exam", 60))          # with their Mark_Component weights
+STATUSES = (("Present", 80), ("Absent", 10), ("Late", 7), ("Excused", 3))
+SLOTS = (("08:30", "10:00"), ("10:15", "11:45"), ("13:00", "14:30"), ("14:45", "16:15"))
+TERM_WEEKS = 12
+
+
+class _RowStream:
+    # File-like object for copy_expert: renders generated rows as CSV only as fast as COPY reads them
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buf = io.StringIO()
+        self.writer = csv.writer(self.buf, lineterminator="\n")
+        self.pending = ""
+        self.count = 0
+
+    def read(self, size=-1):
+        size = size if size and size > 0 else 1 << 16
+        while len(self.pending) < size:
+            chunk = []
+            for row in self.rows:
+                chunk.append(row)
+                if len(chunk) == 1000: break
+            if not chunk: break
+            self.count += len(chunk)
+            self.buf.seek(0); self.buf.truncate()
+            self.writer.writerows(chunk)
+            self.pending += self.buf.getvalue()
+        out, self.pending = self.pending[:size], self.pending[size:]
+        return out
+
+    readline = read
+
+
+def copy_rows(cur, table, columns, rows):
+    stream = _RowStream(rows)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", stream)
+    return stream.count
+
+
+def load_schema(conn, log=print):
+    # part1 + part2 on an empty database, then every migration
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        for name in SCHEMA_FILES:
+            log(f"loading {name} ...")
+            with open(os.path.join(BASE_DIR, name), encoding="utf-8") as f:
+                conn.cursor().execute(f.read())
+    finally:
+        conn.autocommit = autocommit
+    migrate.migrate(conn, log=log)
+
+
+def next_id(cur, table, column):
+    cur.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+    return cur.fetchone()[0]
+
+
+def generate(conn, students, seed=42, courses_per_student=4, sessions=3, term_start=None, log=print):
+    """Appends a data set sized for `students` students; returns {table: rows written}."""
+    rnd = random.Random(seed)
+    cur = conn.cursor()
+    counts = {}
+    term_start = term_start or datetime.date(2026, 9, 7)
+    term_start -= datetime.timedelta(days=term_start.weekday())          # a Monday
+
+    n_dept = max(4, students // 10_000)
+    d0 = next_id(cur, "Department", "department_id")
+    depts = list(range(d0, d0 + n_dept))
+    counts["department"] = copy_rows(cur, "Department", ["department_id", "name"],
+                                     ((d, f"GEN-{d}") for d in depts))
+
+    # Sections and groups have SERIAL ids: inserted in batches with RETURNING
+    sections = execute_values(cur, "INSERT INTO Academic_Section (name, department_id) VALUES %s RETURNING section_id, name, department_id",
+                              [(f"S{d}-{k}", d) for d in depts for k in range(1, 5)], page_size=1000, fetch=True)
+    n_groups = math.ceil(students / 30)
+    groups = execute_values(cur, "INSERT INTO Academic_Group (name, section_id) VALUES %s RETURNING group_id, name, section_id",
+                            [(f"{sections[g % len(sections)][1]}-G{g // len(sections) + 1}", sections[g % len(sections)][0])
+                             for g in range(n_groups)], page_size=1000, fetch=True)
+    counts["academic_section"], counts["academic_group"] = len(sections), len(groups)
+    section_of = {sid: (name, dept) for sid, name, dept in sections}
+
+    courses = [(c, d) for d in depts for c in range(1, 13)]
+    counts["course"] = copy_rows(cur, "Course", ["course_id", "department_id", "name", "description", "failing_grade"],
+                                 ((c, d, f"Course {c} of GEN-{d}", None, 10) for c, d in courses))
+    cur.execute("SELECT to_regclass('mark_component') IS NOT NULL")
+    if cur.fetchone()[0]:                                                  # migrations/001
+        counts["mark_component"] = copy_rows(cur, "Mark_Component", ["course_id", "department_id", "mark_type", "weight"],
+                                             ((c, d, t, w) for c, d in courses for t, w in MARK_TYPES))
+
+    i0 = next_id(cur, "Instructor", "instructor_id")
+    instructors = {d: list(range(i0 + k * 10, i0 + k * 10 + 10)) for k, d in enumerate(depts)}
+    counts["instructor"] = copy_rows(cur, "Instructor", ["instructor_id", "department_id", "last_name", "first_name", "rank"],
+                                     ((i, d, rnd.choice(LAST_NAMES), rnd.choice(FIRST_NAMES), rnd.choice(RANKS))
+                                      for d in depts for i in instructors[d]))
+
+    cur.execute("SELECT COUNT(*) FROM Room")
+    r0 = cur.fetchone()[0]
+    rooms = [(chr(ord("D") + (r0 + k) % 20), f"G{r0 + k:05d}") for k in range(max(20, students // 500))]
+    counts["room"] = copy_rows(cur, "Room", ["building", "roomno", "capacity"],
+                               ((b, r, rnd.randrange(20, 301)) for b, r in rooms))
+
+    # Students: group g belongs to a section, hence to that section's department
+    s0 = next_id(cur, "Student", "student_id")
+    def student_rows():
+        for k in range(students):
+            gid, gname, sid = groups[k // 30]
+            first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+            city, zip_code = rnd.choice(CITIES)
+            dob = datetime.date(2000, 1, 1) + datetime.timedelta(days=rnd.randrange(2500))
+            yield (s0 + k, last, first, dob, f"{rnd.randrange(1, 200)}, street {rnd.randrange(1, 50)}", city, zip_code,
+                   f"0{rnd.randrange(500000000, 799999999)}", None, f"s{s0 + k}@univ.dz", gid, section_of[sid][0], gname)
+    counts["student"] = copy_rows(cur, "Student", ["student_id", "last_name", "first_name", "dob", "address", "city", "zip_code",
+                                                   "phone", "fax", "email", "group_id", "section", "academic_group"], student_rows())
+
+    # Enrollments, and the marks and attendance that go with them. Each student's courses come from
+    # a generator seeded by the student, so the three passes see the same enrollments without keeping
+    # millions of them in memory.
+    dept_courses = {d: [c for c, cd in courses if cd == d] for d in depts}
+    def enrollments():
+        for k in range(students):
+            dept = section_of[groups[k // 30][2]][1]
+            picks = random.Random(seed * 10_000_019 + k).sample(dept_courses[dept], min(courses_per_student, len(dept_courses[dept])))
+            for c in picks: yield s0 + k, c, dept
+    counts["enrollment"] = copy_rows(cur, "Enrollment", ["student_id", "course_id", "department_id", "enrollment_date"],
+                                     ((s, c, d, term_start - datetime.timedelta(days=rnd.randrange(30))) for s, c, d in enrollments()))
+    counts["marks"] = copy_rows(cur, "Marks", ["student_id", "course_id", "department_id", "mark_value", "mark_type"],
+                                ((s, c, d, round(min(20, max(0, rnd.gauss(11.5, 4))), 2), t)
+                                 for s, c, d in enrollments() for t, _ in MARK_TYPES))
+    statuses, weights = zip(*STATUSES)
+    counts["attendance"] = copy_rows(cur, "Attendance", ["student_id", "course_id", "attendance_date", "status"],
+                                     ((s, c, term_start + datetime.timedelta(weeks=w, days=c % 5), rnd.choices(statuses, weights)[0])
+                                      for s, c, d in enrollments() for w in range(sessions)))
+
+    # Reservations: each course gets its own (room, weekday, slot), so the timetable has no overlaps
+    cur.execute("SELECT COALESCE(MAX(reservation_id), 0) FROM Reservation")
+    res0 = cur.fetchone()[0]
+    def reservations():
+        n = res0
+        for k, (c, d) in enumerate(courses):
+            b, r = rooms[k % len(rooms)]
+            cell = k // len(rooms)
+            if cell >= 5 * len(SLOTS): continue          # every room is full for the week
+            start, end = SLOTS[cell // 5]
+            for w in range(TERM_WEEKS):
+                n += 1
+                yield n, b, r, c, d, rnd.choice(instructors[d]), term_start + datetime.timedelta(weeks=w, days=cell % 5), start, end, 1
+    counts["reservation"] = copy_rows(cur, "Reservation", ["reservation_id", "building", "roomno", "course_id", "department_id",
+                                                           "instructor_id", "reserv_date", "start_time", "end_time", "hours_number"],
+                                      reservations())
+    # Keep the reservation_id default (migrations/005) ahead of the ids written here
+    cur.execute("SELECT setval(pg_get_serial_sequence('reservation', 'reservation_id'), MAX(reservation_id)) FROM Reservation "
+                "WHERE pg_get_serial_sequence('reservation', 'reservation_id') IS NOT NULL")
+    conn.commit()
+
+    log("analyzing ...")
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try: cur.execute("ANALYZE")
+    finally: conn.autocommit = autocommit
+    return counts
+
+
+def parse_scale(text):
+    text = text.strip().lower()
+    if text in SCALES: return SCALES[text]
+    if text.isdigit() and int(text) > 0: return int(text)
+    raise argparse.ArgumentTypeError(f"use {', '.join(SCALES)} or a number of students")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Fill the university database with reproducible synthetic data.")
+    ap.add_argument("--scale", type=parse_scale, default=SCALES["10k"], help="number of students: 10k, 100k, 1m or a number")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--courses-per-student", type=int, default=4)
+    ap.add_argument("--sessions", type=int, default=3, help="attendance records per enrollment")
+    ap.add_argument("--schema", action="store_true", help="load part1/part2 and the migrations first (empty database)")
+    args = ap.parse_args(argv)
+    try:
+        conn = psycopg2.connect(**db_connection.connect_params(db_connection.load_config()))
+    except psycopg2.Error as e:
+        print(f"Error connecting to DB: {e}", file=sys.stderr)
+        return 2
+    try:
+        if args.schema: load_schema(conn)
+        started = datetime.datetime.now()
+        counts = generate(conn, args.scale, args.seed, args.courses_per_student, args.sessions)
+        for table, n in counts.items(): print(f"{table:18} {n:>12,}")
+        print(f"done in {(datetime.datetime.now() - started).total_seconds():.1f} s")
+        return 0
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Generation failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,240 @@
+import os
+import time
+import threading
+import configparser
+from contextlib import contextmanager
+
 import psycopg2
-from tkinter import messagebox
-
-def get_connection():
-    try:
-        conn = psycopg2.connect(
-            host="localhost",
-            # UPDATED: In your screenshot, the active database is 'final-check'
-            database="test",  
-            
-            # UPDATED: The user shown in your screenshot is 'postgres'
-            user="postgres",        
-            
-            # CRITICAL: Delete this text and type your actual pgAdmin login password
-            password="bouh@000", 
-            
-            port="5432"
-        )
+import psycopg2.extensions
+
+import instrumentation
+
+# ====================================================================
+#   CONFIGURATION
+# ====================================================================
+# Settings are read from db_config.ini ([database], [pool], [cache] and
+# [instrumentation] sections, see db_config.example.ini) and can be
+# overridden with the usual libpq environment variables (PGHOST,
+# PGDATABASE, PGUSER, PGPASSWORD, PGPORT), UNIV_POOL_* for the pool,
+# UNIV_CACHE_* for the result cache or UNIV_SLOW_* for the slow-query log.
+CONFIG_FILE = os.environ.get("UNIV_DB_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_config.ini"))
+
+DEFAULTS = {
+    "host": "localhost",
+    "database": "test",
+    "user": "postgres",
+    "password": "",
+    "port": "5432",
+    "pool_min": 1,
+    "pool_max": 8,
+    "max_idle": 300,       # seconds an idle connection is kept before being recycled
+    "health_check": 30,    # seconds after which an idle connection is pinged before reuse
+    "checkout_timeout": 30,
+    "cache_mb": 32,        # memory cap of the query result cache (0 disables it)
+    "cache_max_age": 300,  # seconds a cached result may be served
+    "cache_notify": "yes", # evict on other clients' writes announced by the audit triggers
+    "prefetch": "students, reservations",  # queries.TABLES pages loaded in the background after startup
+    "instrument": "yes",   # time every statement of pooled connections (instrumentation.py)
+    "slow_ms": 500,        # statements at least this slow are written to slow_log
+    "slow_log": os.path.join(os.path.dirname(os.path.abspath(__file__)), "slow_queries.log"),
+    "slow_explain": "no",  # also log the EXPLAIN plan of slow SELECTs
+}
+
+ENV_KEYS = {
+    "host": "PGHOST", "database": "PGDATABASE", "user": "PGUSER", "password": "PGPASSWORD", "port": "PGPORT",
+    "pool_min": "UNIV_POOL_MIN", "pool_max": "UNIV_POOL_MAX", "max_idle": "UNIV_POOL_MAX_IDLE",
+    "health_check": "UNIV_POOL_HEALTH_CHECK", "checkout_timeout": "UNIV_POOL_TIMEOUT",
+    "cache_mb": "UNIV_CACHE_MB", "cache_max_age": "UNIV_CACHE_MAX_AGE", "cache_notify": "UNIV_CACHE_NOTIFY",
+    "prefetch": "UNIV_CACHE_PREFETCH",
+    "instrument": "UNIV_INSTRUMENT", "slow_ms": "UNIV_SLOW_MS", "slow_log": "UNIV_SLOW_LOG", "slow_explain": "UNIV_SLOW_EXPLAIN",
+}
+
+
+def load_config(path=None):
+    cfg = dict(DEFAULTS)
+    parser = configparser.ConfigParser()
+    parser.read(path or CONFIG_FILE)
+    for section in ("database", "pool", "cache", "instrumentation"):
+        if parser.has_section(section):
+            for k, v in parser.items(section):
+                if k in cfg: cfg[k] = v
+    for k, env in ENV_KEYS.items():
+        if os.environ.get(env): cfg[k] = os.environ[env]
+    for k in ("pool_min", "pool_max"): cfg[k] = int(cfg[k])
+    for k in ("max_idle", "health_check", "checkout_timeout", "cache_mb", "cache_max_age", "slow_ms"): cfg[k] = float(cfg[k])
+    for k in ("cache_notify", "instrument", "slow_explain"): cfg[k] = str(cfg[k]).strip().lower() in ("1", "yes", "true", "on")
+    cfg["prefetch"] = [t.strip().lower() for t in str(cfg["prefetch"]).split(",") if t.strip()]
+    return cfg
+
+
+def connect_params(cfg):
+    return {k: cfg[k] for k in ("host", "database", "user", "password", "port")}
+
+
+# ====================================================================
+#   CONNECTION POOL
+# ====================================================================
+class PoolTimeout(psycopg2.OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections with health checks and idle recycling."""
+
+    def __init__(self, minconn=1, maxconn=8, max_idle=300, health_check=30, timeout=30, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("invalid pool size: min=%s max=%s" % (minconn, maxconn))
+        self.minconn, self.maxconn = minconn, maxconn
+        self.max_idle, self.health_check, self.timeout = max_idle, health_check, timeout
+        self.connect_kwargs = connect_kwargs
+        self._idle = []          # [(conn, returned_at)], most recently used last
+        self._used = set()
+        self._opening = 0        # connections being opened outside the lock
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = {"created": 0, "checkouts": 0, "returns": 0, "waits": 0,
+                      "recycled": 0, "health_failures": 0, "discarded": 0,
+                      "connect_time": 0.0, "checkout_time": 0.0}   # seconds, summed over created / checkouts
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        started = time.monotonic()
+        conn = psycopg2.connect(**self.connect_kwargs)
+        with self._cond:
+            self.stats["created"] += 1
+            self.stats["connect_time"] += time.monotonic() - started
         return conn
-    except Exception as e:
-        messagebox.showerror("Connection Error", f"Error connecting to DB: {e}")
-        return None
\ No newline at end of file
+
+    def _healthy(self, conn, idle_for):
+        if conn.closed: return False
+        if idle_for < self.health_check: return True
+        try:
+            cur = conn.cursor(); cur.execute("SELECT 1"); cur.close(); conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self._cond: self.stats["health_failures"] += 1
+            return False
+
+    def _close(self, conn):
+        try: conn.close()
+        except psycopg2.Error: pass
+
+    def _drop(self, conn, stat="discarded"):
+        # Forget a checked-out connection and close it, freeing its slot
+        with self._cond:
+            self._used.discard(conn); self.stats[stat] += 1
+            self._cond.notify()
+        self._close(conn)
+
+    def _prune(self):
+        # Idle recycling: close connections idle longer than max_idle, down to minconn (caller holds the lock)
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.max_idle and len(self._idle) + len(self._used) > self.minconn:
+            conn, _ = self._idle.pop(0)
+            self.stats["recycled"] += 1
+            self._close(conn)
+
+    def getconn(self, timeout=None):
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+        while True:
+            with self._cond:
+                if self._closed: raise psycopg2.InterfaceError("connection pool is closed")
+                self._prune()
+                if self._idle:
+                    conn, since = self._idle.pop()
+                    self._used.add(conn)
+                elif len(self._used) + self._opening < self.maxconn:
+                    conn, since = None, None
+                    self._opening += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0: raise PoolTimeout("no free connection after %.0fs (pool max=%d)" % (self.timeout, self.maxconn))
+                    self.stats["waits"] += 1
+                    self._cond.wait(remaining)
+                    continue
+            # Handshakes and health pings happen outside the lock so other threads are not blocked
+            if conn is None:
+                try:
+                    conn = self._connect()
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        if conn is not None:
+                            self._used.add(conn); self.stats["checkouts"] += 1
+                            self.stats["checkout_time"] += time.monotonic() - started
+                        self._cond.notify()
+                return conn
+            idle_for = time.monotonic() - since
+            if idle_for > self.max_idle: self._drop(conn, "recycled"); continue
+            if not self._healthy(conn, idle_for): self._drop(conn); continue
+            with self._cond:
+                self.stats["checkouts"] += 1
+                self.stats["checkout_time"] += time.monotonic() - started
+            return conn
+
+    def putconn(self, conn, discard=False):
+        with self._cond:
+            if conn not in self._used: return
+            self.stats["returns"] += 1
+        if not (discard or self._closed or conn.closed):
+            try:
+                # Never hand out a connection that is still inside a transaction
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE: conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard or self._closed or conn.closed:
+            self._drop(conn); return
+        with self._cond:
+            self._used.discard(conn)
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            # A dropped server connection leaves conn.closed set; putconn discards it
+            self.putconn(conn)
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, idle=len(self._idle), in_use=len(self._used), max=self.maxconn)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle: self._close(conn)
+            self._idle = []
+            self._cond.notify_all()
+
+
+# ====================================================================
+#   MODULE-LEVEL POOL (one per process)
+# ====================================================================
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            cfg = load_config()
+            kwargs = connect_params(cfg)
+            if cfg["instrument"]:
+                instrumentation.configure(cfg)
+                kwargs["cursor_factory"] = instrumentation.InstrumentedCursor
+            _pool = ConnectionPool(cfg["pool_min"], cfg["pool_max"], cfg["max_idle"], cfg["health_check"],
+                                   cfg["checkout_timeout"], **kwargs)
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None: _pool.closeall()
+        _pool = None
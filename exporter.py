@@ -0,0 +1,125 @@
+import os
+import gzip
+import time
+import tempfile
+import importlib.util
+
+import psycopg2.extensions
+
+# ====================================================================
+#   STREAMING EXPORT (COPY (query) TO STDOUT)
+# ====================================================================
+# A table or report is exported by handing its query to COPY: the server
+# formats the CSV and psycopg2 writes it to the file in chunks as they
+# arrive, so the rows never become Python objects nor Treeview items.
+# .csv.gz files are compressed on the fly. Parquet (needs the optional
+# pyarrow package) is converted from that CSV in a second streamed pass,
+# record batch by record batch, with column types taken from the query.
+# Output goes to <path>.part first and is renamed once complete.
+
+HAS_PARQUET = importlib.util.find_spec("pyarrow") is not None
+
+FILETYPES = [("CSV files", "*.csv"), ("Compressed CSV", "*.csv.gz")] + ([("Parquet files", "*.parquet")] if HAS_PARQUET else [])
+
+PROGRESS_EVERY = 0.25   # seconds between progress reports
+
+# Result type OIDs -> pyarrow type names; anything else is exported as text
+ARROW_TYPES = {
+    16: "bool_", 20: "int64", 21: "int16", 23: "int32",
+    700: "float32", 701: "float64", 1700: "float64",
+    1082: "date32",
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def export_format(path):
+    name = path.lower()
+    if name.endswith(".parquet"): return "parquet"
+    if name.endswith(".gz"): return "csv.gz"
+    return "csv"
+
+
+class _Sink:
+    # File-like target for copy_expert: counts bytes, honours cancellation and reports progress
+    def __init__(self, f, job=None):
+        self.f, self.job = f, job
+        self.bytes = 0
+        self._reported = time.monotonic()
+
+    def write(self, data):
+        if self.job: self.job.check()
+        self.f.write(data)
+        self.bytes += len(data)
+        if self.job and time.monotonic() - self._reported >= PROGRESS_EVERY:
+            self._reported = time.monotonic()
+            self.job.progress(("copy", self.bytes))
+
+
+def copy_query(conn, sql, params, f, job=None):
+    """Streams the CSV (with header) of a query into binary file `f`; returns (rows, bytes)."""
+    cur = conn.cursor()
+    # COPY takes no parameters, so they are bound client-side first
+    query = cur.mogrify(sql.strip().rstrip(";"), params or None).decode(psycopg2.extensions.encodings[conn.encoding])
+    sink = _Sink(f, job)
+    try:
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", sink)
+        return cur.rowcount, sink.bytes
+    finally:
+        conn.rollback()
+
+
+def _column_types(conn, sql, params):
+    cur = conn.cursor()
+    cur.execute(f"SELECT * FROM ({sql.strip().rstrip(';')}) q LIMIT 0", params or None)
+    columns = [(d.name, d.type_code) for d in cur.description]
+    conn.rollback()
+    return columns
+
+
+def _csv_to_parquet(src, dest, columns, job=None):
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+    types = {name: getattr(pa, ARROW_TYPES[oid])() if oid in ARROW_TYPES else pa.string() for name, oid in columns}
+    types.update({name: pa.timestamp("us") for name, oid in columns if oid == 1114})
+    convert = pacsv.ConvertOptions(column_types=types, true_values=["t"], false_values=["f"],
+                                   # COPY writes NULL as an empty field and '' as ""
+                                   null_values=[""], strings_can_be_null=True, quoted_strings_can_be_null=False)
+    reader = pacsv.open_csv(src, read_options=pacsv.ReadOptions(block_size=4 * 1048576),
+                            parse_options=pacsv.ParseOptions(newlines_in_values=True), convert_options=convert)
+    rows = 0
+    with pq.ParquetWriter(dest, reader.schema) as writer:
+        for batch in reader:
+            if job: job.check()
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            if job: job.progress(("parquet", rows))
+    return rows
+
+
+def export_query(conn, sql, params, path, job=None):
+    """Writes the result of a query to `path` (.csv, .csv.gz or .parquet); returns (rows, bytes written)."""
+    fmt = export_format(path)
+    if fmt == "parquet" and not HAS_PARQUET:
+        raise ExportError("Parquet export needs the pyarrow package (pip install pyarrow).")
+    part = path + ".part"
+    tmp = None
+    try:
+        if fmt == "parquet":
+            columns = _column_types(conn, sql, params)
+            fd, tmp = tempfile.mkstemp(suffix=".csv", dir=os.path.dirname(os.path.abspath(path)))
+            with os.fdopen(fd, "wb") as f: copy_query(conn, sql, params, f, job)
+            rows = _csv_to_parquet(tmp, part, columns, job)
+        else:
+            with (gzip.open(part, "wb", compresslevel=6) if fmt == "csv.gz" else open(part, "wb")) as f:
+                rows, _ = copy_query(conn, sql, params, f, job)
+        os.replace(part, path)
+        return rows, os.path.getsize(path)
+    except BaseException:
+        if os.path.exists(part): os.remove(part)
+        raise
+    finally:
+        if tmp and os.path.exists(tmp): os.remove(tmp)
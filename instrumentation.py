@@ -0,0 +1,209 @@
+import re
+import time
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+
+import psycopg2
+import psycopg2.extensions
+
+# ====================================================================
+#   QUERY INSTRUMENTATION
+# ====================================================================
+# Pooled connections are opened with cursor_factory=InstrumentedCursor
+# (see db_connection.get_pool), so every execute / fetch / COPY made by
+# the app is timed and added to STATS under the statement's fingerprint:
+# the SQL with literals and placeholders replaced by "?", so calls that
+# differ only in their values are counted together. Parameters are only
+# recorded by shape (types and list lengths), never by value.
+# Statements slower than the threshold are written to a rotating log,
+# optionally followed by their EXPLAIN plan.
+
+# Upper bounds (ms) of the execute-time histogram buckets; the last bucket holds everything slower
+BUCKETS_MS = (1, 5, 20, 100, 500, 2000)
+
+SLOW_LOG_BYTES = 5 * 1048576
+SLOW_LOG_BACKUPS = 3
+
+slow_log = logging.getLogger("university.slow")
+slow_log.propagate = False
+
+_settings = {"slow_ms": 500.0, "explain": False}
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+_EXPLAINABLE_RE = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+
+
+def fingerprint(sql):
+    sql = _STRING_RE.sub("?", sql)
+    sql = _PLACEHOLDER_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _LIST_RE.sub("(...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def params_shape(params):
+    if params is None: return "()"
+    if isinstance(params, dict): return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(f"list[{len(p)}]" if isinstance(p, (list, tuple)) else type(p).__name__ for p in params) + ")"
+
+
+class QueryStats:
+    """Per-fingerprint timings, filled from worker threads and read by the Performance tab."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = {}
+
+    def _entry(self, fp):
+        e = self.queries.get(fp)
+        if e is None:
+            e = self.queries[fp] = {"calls": 0, "errors": 0, "execute": 0.0, "max": 0.0, "fetch": 0.0, "rows": 0,
+                                    "render": 0.0, "rendered": 0, "shapes": set(), "hist": [0] * (len(BUCKETS_MS) + 1)}
+        return e
+
+    def executed(self, fp, shape, seconds, ok=True):
+        ms = seconds * 1000
+        bucket = next((i for i, b in enumerate(BUCKETS_MS) if ms < b), len(BUCKETS_MS))
+        with self._lock:
+            e = self._entry(fp)
+            e["calls"] += 1
+            if not ok: e["errors"] += 1
+            e["execute"] += seconds
+            e["max"] = max(e["max"], seconds)
+            e["hist"][bucket] += 1
+            e["shapes"].add(shape)
+
+    def fetched(self, fp, seconds, rows):
+        with self._lock:
+            e = self._entry(fp)
+            e["fetch"] += seconds
+            e["rows"] += rows
+
+    def rendered(self, sql, seconds, rows):
+        # Time spent inserting a result into a Treeview (Tk thread)
+        with self._lock:
+            e = self._entry(fingerprint(sql))
+            e["render"] += seconds
+            e["rendered"] += rows
+
+    def snapshot(self):
+        with self._lock:
+            return {fp: dict(e, shapes=sorted(e["shapes"]), hist=list(e["hist"])) for fp, e in self.queries.items()}
+
+    def reset(self):
+        with self._lock: self.queries.clear()
+
+
+STATS = QueryStats()
+
+
+def configure(cfg):
+    """Applies the [instrumentation] settings of db_connection.load_config()."""
+    _settings["slow_ms"] = cfg["slow_ms"]
+    _settings["explain"] = cfg["slow_explain"]
+    for h in list(slow_log.handlers):
+        slow_log.removeHandler(h); h.close()
+    if cfg["slow_log"]:
+        handler = RotatingFileHandler(cfg["slow_log"], maxBytes=SLOW_LOG_BYTES, backupCount=SLOW_LOG_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_log.addHandler(handler)
+        slow_log.setLevel(logging.INFO)
+
+
+def _explain(cur, sql, params):
+    # Plan only (no ANALYZE: the statement is not run again); skipped when it cannot be done safely
+    conn = cur.connection
+    if cur.name or not _EXPLAINABLE_RE.match(sql): return None
+    if conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_INERROR: return None
+    plain = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    savepoint = not conn.autocommit   # a failing EXPLAIN must not abort the caller's transaction
+    try:
+        if savepoint: plain.execute("SAVEPOINT instrumentation_explain")
+        plain.execute("EXPLAIN " + sql, params)
+        plan = "\n".join("    " + r[0] for r in plain.fetchall())
+        if savepoint: plain.execute("RELEASE SAVEPOINT instrumentation_explain")
+        return plan
+    except psycopg2.Error as e:
+        if savepoint: plain.execute("ROLLBACK TO SAVEPOINT instrumentation_explain")
+        return f"    (EXPLAIN failed: {e})"
+    finally:
+        plain.close()
+
+
+def _record(cur, sql, params, seconds, ok):
+    if not isinstance(sql, str):
+        sql = sql.as_string(cur) if hasattr(sql, "as_string") else sql.decode()
+    fp, shape = fingerprint(sql), params_shape(params)
+    STATS.executed(fp, shape, seconds, ok)
+    ms = seconds * 1000
+    if ms >= _settings["slow_ms"] and slow_log.handlers:
+        msg = f"{ms:.1f} ms  rows={cur.rowcount}  params={shape}  {fp}"
+        if ok and _settings["explain"]:
+            plan = _explain(cur, sql, params)
+            if plan: msg += "\n" + plan
+        slow_log.info(msg)
+    return fp
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    _fp = None
+
+    def execute(self, query, vars=None):
+        started, ok = time.perf_counter(), False
+        try:
+            result = super().execute(query, vars)
+            ok = True
+            return result
+        finally:
+            self._fp = _record(self, query, vars, time.perf_counter() - started, ok)
+
+    def copy_expert(self, sql, file, size=8192):
+        started, ok = time.perf_counter(), False
+        try:
+            result = super().copy_expert(sql, file, size)
+            ok = True
+            return result
+        finally:
+            self._fp = _record(self, sql, None, time.perf_counter() - started, ok)
+
+    def _fetched(self, started, rows):
+        if self._fp is not None: STATS.fetched(self._fp, time.perf_counter() - started, rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+
+def pg_stat_statements(conn, limit=50):
+    """Top statements of this database by total time: (columns, rows), or None when the extension is not installed."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+    if cur.fetchone() is None: return None
+    # PostgreSQL 13 renamed total_time / mean_time to total_exec_time / mean_exec_time
+    total, mean = ("total_exec_time", "mean_exec_time") if conn.server_version >= 130000 else ("total_time", "mean_time")
+    cur.execute(f"""
+        SELECT regexp_replace(query, '\\s+', ' ', 'g'), calls, round({total}::numeric, 1), round({mean}::numeric, 2), rows
+        FROM pg_stat_statements
+        WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+        ORDER BY {total} DESC
+        LIMIT %s""", (limit,))
+    return ["Query", "Calls", "Total ms", "Mean ms", "Rows"], cur.fetchall()
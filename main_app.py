@@ -1,15 +1,87 @@
+import time
+STARTED = time.perf_counter()   # cold-start clock: includes importing Tk, ttkbootstrap and PIL
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from tkinter import messagebox, simpledialog
+from tkinter import Menu, messagebox, simpledialog, filedialog
 from PIL import Image, ImageTk 
 import db_connection
+from query_runner import QueryRunner, Cancelled, ConnectError
+from paging import TreePager
+import queries
+import bulk_import
+import exporter
+from pg_listener import NotifyListener, AUDIT_CHANNEL, parse_payload
+from query_cache import QueryCache, tables_written, with_triggers
+import instrumentation
+import psycopg2
 import os
+import datetime
+import logging
+
+# Rows fetched per page, and the most rows a paged tree keeps at once
+PAGE_SIZE = 500
+MAX_TREE_ROWS = 2000
+
+log = logging.getLogger("university")
+
+class BusyBar:
+    # Per-tab activity strip (spinner + status + Cancel), only visible while that tab has queries running
+    def __init__(self, parent):
+        self.jobs = set()
+        self.frame = ttk.Frame(parent)
+        self.bar = ttk.Progressbar(self.frame, mode="indeterminate", length=180, bootstyle="info-striped")
+        self.bar.pack(side="left", padx=5)
+        self.lbl = ttk.Label(self.frame, text="", font=("Arial", 9, "italic"))
+        self.lbl.pack(side="left", padx=5)
+        ttk.Button(self.frame, text="Cancel", bootstyle="danger-outline", command=self.cancel, width=8).pack(side="right", padx=5)
+
+    def start(self, job, text):
+        self.jobs.add(job)
+        self.lbl.config(text=text)
+        if len(self.jobs) == 1:
+            self.frame.pack(side="bottom", fill="x", padx=10, pady=(0, 5))
+            self.bar.config(mode="indeterminate")
+            self.bar.start(15)
+
+    def progress(self, fraction, text):
+        self.bar.stop()
+        self.bar.config(mode="determinate", maximum=100, value=min(100, fraction * 100))
+        self.lbl.config(text=text)
+
+    def note(self, text):
+        # Status text only, for work whose total is not known in advance
+        self.lbl.config(text=text)
+
+    def stop(self, job):
+        self.jobs.discard(job)
+        if not self.jobs:
+            self.bar.stop()
+            self.frame.pack_forget()
+
+    def cancel(self):
+        for job in list(self.jobs): job.cancel()
+        self.lbl.config(text="Cancelling...")
 
 class UniversityApp:
     def __init__(self, root):
         self.root = root
         self.root.title("University Database Manager (Connected to Real DB)")
         self.root.geometry("1400x950")
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Background workers: one per pooled connection, so every tab can load at the same time
+        cfg = db_connection.load_config()
+        self.runner = QueryRunner(root, workers=cfg["pool_max"])
+        # Results of reports and table pages, evicted per table on writes (cache_mb = 0 keeps nothing)
+        self.cache = QueryCache(int(cfg["cache_mb"] * 1048576), cfg["cache_max_age"])
+        self.cache_notify = cfg["cache_notify"]
+        self.prefetch = [t for t in cfg["prefetch"] if t in queries.TABLES]
+        self.busy_bars = {}
+        self.tree_tab = {}
+        self.tree_scroll = {}
+        self.tree_jobs = {}
+        self.pagers = {}
+        self.tree_sources = {}   # tree -> (sql, params) of the result it shows, for trees without a pager
         
         # --- 1. MAIN MENU STRUCTURE ---
         # Using 'primary' bootstyle for the main tabs to give them a colored accent
@@ -21,12 +93,14 @@ class UniversityApp:
         self.tab_academic = ttk.Frame(self.main_tabs)  
         self.tab_queries = ttk.Frame(self.main_tabs)   
         self.tab_audit = ttk.Frame(self.main_tabs)     
+        self.tab_perf = ttk.Frame(self.main_tabs)
 
         self.main_tabs.add(self.tab_home, text=" Home ")
         self.main_tabs.add(self.tab_crud, text=" General Data (CRUD) ")
         self.main_tabs.add(self.tab_academic, text=" Academic Management ")
         self.main_tabs.add(self.tab_queries, text=" Reports ")
         self.main_tabs.add(self.tab_audit, text=" Audit Logs ")
+        self.main_tabs.add(self.tab_perf, text=" Performance ")
 
         # --- 2. SUB-MENUS ---
         # A. CRUD Sub-menu
@@ -48,61 +122,188 @@ class UniversityApp:
         self.t_grade = ttk.Frame(self.acad_tabs); self.acad_tabs.add(self.t_grade, text="Results Processing") 
 
         # --- 3. BUILD UI ---
+        # Only Home is built now; every other tab is built (and its data loaded) the first time it is shown
         self.build_home()
-        # CRUD
-        self.build_students(self.t_stud)
-        self.build_instructors(self.t_inst)
-        self.build_departments(self.t_dept)
-        self.build_courses(self.t_cour)
-        self.build_rooms(self.t_room)
-        # Academic
-        self.build_reservations(self.t_res)
-        self.build_enrollment(self.t_enr)
-        self.build_marks(self.t_mark)
-        self.build_attendance(self.t_att) 
-        self.build_grading(self.t_grade) 
-        # Reports & Audit
-        self.build_queries_tab(self.tab_queries)
-        self.build_audit_tab(self.tab_audit)
+        self.builders = {
+            # CRUD
+            self.t_stud: self.build_students, self.t_inst: self.build_instructors, self.t_dept: self.build_departments,
+            self.t_cour: self.build_courses, self.t_room: self.build_rooms,
+            # Academic
+            self.t_res: self.build_reservations, self.t_enr: self.build_enrollment, self.t_mark: self.build_marks,
+            self.t_att: self.build_attendance, self.t_grade: self.build_grading,
+            # Reports & Audit
+            self.tab_queries: self.build_queries_tab, self.tab_audit: self.build_audit_tab, self.tab_perf: self.build_perf_tab,
+        }
+        self.prefetch_tabs = {"students": self.t_stud, "instructors": self.t_inst, "departments": self.t_dept,
+                              "courses": self.t_cour, "rooms": self.t_room, "reservations": self.t_res,
+                              "enrollment": self.t_enr, "marks": self.t_mark, "attendance": self.t_att}
+        for nb in (self.main_tabs, self.crud_tabs, self.acad_tabs):
+            nb.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
+        # New audit entries (from this or any other client) are pushed by the audit triggers
+        self.audit_tail_after = None
+        self.listener = NotifyListener([AUDIT_CHANNEL], self.on_listener_event)
+        self.listener.start()
+        self.show_cache_stats()
+        # after_idle runs once the first layout and redraw are done; the timer then fires on the next loop pass
+        self.root.after_idle(lambda: self.root.after(0, self.on_first_paint))
 
     # ==========================
     #   HELPER: REAL DB EXECUTION
     # ==========================
-    def execute_sql(self, sql, params, callback=None):
-        conn = db_connection.get_connection()
-        if conn:
-            try:
-                cur = conn.cursor()
-                cur.execute(sql, params)
-                conn.commit()
-                messagebox.showinfo("Success", "Operation Successful!")
-                if callback: callback()
-                self.load_audit()
-            except Exception as e:
-                conn.rollback()
-                messagebox.showerror("Database Error", f"Operation Failed:\n{e}")
-            finally:
-                conn.close()
+    def current_tab(self):
+        tab = self.root.nametowidget(self.main_tabs.select())
+        for nb in (self.crud_tabs, self.acad_tabs):
+            if nb.master is tab: return self.root.nametowidget(nb.select())
+        return tab
+
+    def on_tab_changed(self, e):
+        # Selecting a main tab shows its selected sub-tab too, so build whichever frame is now visible
+        self.ensure_built(self.current_tab())
+
+    def ensure_built(self, tab):
+        build = self.builders.pop(tab, None)
+        if build:
+            started = time.perf_counter()
+            build(tab)
+            log.debug("built tab %s in %.0f ms", tab, (time.perf_counter() - started) * 1000)
+
+    def on_first_paint(self):
+        ms = (time.perf_counter() - STARTED) * 1000
+        log.info("startup: first paint after %.0f ms", ms)
+        self.lbl_startup.config(text=f"Window ready in {ms:.0f} ms")
+        self.start_prefetch()
+
+    def start_prefetch(self):
+        # Warms the query cache with the first page of likely next tabs, so opening them needs no round trip
+        for name in self.prefetch:
+            if self.prefetch_tabs.get(name) not in self.builders: continue   # already built and loading
+            sql, params = queries.TABLES[name].first(PAGE_SIZE)
+            self.runner.submit(lambda conn, job, sql=sql, params=params: self.cache.fetch(conn, sql, params), None,
+                               lambda e, name=name: log.warning("prefetch of %s failed: %s", name, e))
+
+    def busy_bar(self, tab):
+        if tab not in self.busy_bars: self.busy_bars[tab] = BusyBar(tab)
+        return self.busy_bars[tab]
+
+    def run_async(self, work, on_done=None, err_title="Database Error", tab=None, text="Loading...", on_error=None, on_progress=None, on_stop=None):
+        # Runs work(conn, job) off the UI thread and reports back on the Tk thread.
+        # on_stop() runs whenever the job ends without a result (failed or cancelled), before the error is shown.
+        bar = self.busy_bar(tab or self.current_tab())
+        def done(result):
+            bar.stop(job)
+            if on_done: on_done(result)
+        def failed(e):
+            bar.stop(job)
+            if on_stop: on_stop()
+            if isinstance(e, Cancelled): return
+            if on_error: on_error(e)
+            elif isinstance(e, ConnectError): messagebox.showerror("Connection Error", f"Error connecting to DB: {e}")
+            else: messagebox.showerror(err_title, f"{e}")
+        job = self.runner.submit(work, done, failed, on_progress)
+        bar.start(job, text)
+        return job
+
+    def execute_sql(self, sql, params, callback=None, tree=None):
+        # With a paged `tree`, the statement returns the rows it changed and only those items are patched
+        pager = self.pagers.get(tree)
+        if pager: sql += f" RETURNING {', '.join(pager.query.columns)}"
+        def work(conn, job):
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            rows = cur.fetchall() if pager else None
+            conn.commit()
+            # Only results that read a written table are dropped (everything, if the statement is not recognised)
+            self.cache.invalidate(tables_written(sql))
+            return rows
+        def done(rows):
+            if pager:
+                pager.patch(sql.split(None, 1)[0].upper(), rows)
+                if not rows: messagebox.showwarning("No Change", "No row matched: nothing was changed.")
+                else: messagebox.showinfo("Success", "Operation Successful!")
+            else: messagebox.showinfo("Success", "Operation Successful!")
+            if callback: callback()
+            self.tail_audit()
+        self.run_async(work, done, text="Saving...",
+                       on_error=lambda e: messagebox.showerror("Database Error", f"Operation Failed:\n{e}"))
 
     def run_query(self, sql, tree, params=None):
-        for r in tree.get_children(): tree.delete(r)
-        conn = db_connection.get_connection()
-        if conn:
-            try:
-                cur = conn.cursor()
-                if params: cur.execute(sql, params)
-                else: cur.execute(sql)
-                rows = cur.fetchall()
-                if rows:
-                    if hasattr(self, 'tr_query') and tree == self.tr_query: 
-                        cols = [desc[0] for desc in cur.description]
-                        tree['columns'] = cols
-                        for c in cols: tree.heading(c, text=c); tree.column(c, anchor="center")
-                    
-                    for row in rows: tree.insert("", "end", values=row)
-            except Exception as e: 
-                messagebox.showerror("Read Error", f"{e}")
-            finally: conn.close()
+        # A newer load for the same tree supersedes (and cancels) the previous one
+        prev = self.tree_jobs.get(tree)
+        if prev: prev.cancel()
+        def work(conn, job):
+            return self.cache.fetch(conn, sql, params)
+        def done(result):
+            if self.tree_jobs.get(tree) is not job: return
+            del self.tree_jobs[tree]
+            self.tree_sources[tree] = (sql, params)
+            cols, rows = result
+            for r in tree.get_children(): tree.delete(r)
+            if rows:
+                if hasattr(self, 'tr_query') and tree == self.tr_query: 
+                    tree['columns'] = cols
+                    for c in cols: tree.heading(c, text=c); tree.column(c, anchor="center")
+                
+                started = time.perf_counter()
+                for row in rows: tree.insert("", "end", values=row)
+                instrumentation.STATS.rendered(sql, time.perf_counter() - started, len(rows))
+        job = self.run_async(work, done, err_title="Read Error", tab=self.tree_tab.get(tree))
+        self.tree_jobs[tree] = job
+
+    def import_csv(self, table, callback):
+        path = filedialog.askopenfilename(title=f"Import CSV into {table}", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path: return
+        bar = self.busy_bar(self.current_tab())
+        name = os.path.basename(path)
+        def progress(p):
+            done, total = p
+            if done >= total: bar.progress(1, f"{name}: validating and inserting rows...")
+            else: bar.progress(done / total, f"{name}: {done / 1048576:.1f} of {total / 1048576:.1f} MB copied")
+        def done(result):
+            errors = result["errors"]
+            if errors:
+                report = bulk_import.write_error_report(path, errors)
+                more = "+" if len(errors) >= bulk_import.MAX_ERRORS else ""
+                lines = "\n".join(f"Line {n}: {msg}" for n, msg in errors[:15])
+                messagebox.showerror("Import Rejected", f"{len(errors)}{more} invalid row(s) - nothing was imported.\n\n{lines}\n\nFull report: {report}")
+                return
+            messagebox.showinfo("Import Complete", f"{result['inserted']} row(s) imported into {table}.")
+            self.cache.invalidate(with_triggers({table.lower()}))
+            callback()
+            self.tail_audit()
+        self.run_async(lambda conn, job: bulk_import.import_csv(conn, table, path, job), done,
+                       err_title="Import Error", text=f"Importing {name}...", on_progress=progress)
+
+    def export_tree(self, tree):
+        # Streams the query behind a tree to disk with COPY; the rows never pass through the widget
+        if tree in self.pagers: sql, params = self.pagers[tree].query.select_all(); name = self.pagers[tree].query.table
+        elif tree in self.tree_sources: (sql, params), name = self.tree_sources[tree], "export"
+        else: return messagebox.showinfo("Export", "There is nothing to export in this view yet.")
+        self.export_query(sql, params, name, self.tree_tab.get(tree) or self.current_tab())
+
+    def export_query(self, sql, params, name, tab):
+        path = filedialog.asksaveasfilename(title="Export", initialfile=f"{name.lower()}.csv", defaultextension=".csv", filetypes=exporter.FILETYPES)
+        if not path: return
+        bar = self.busy_bar(tab)
+        fname = os.path.basename(path)
+        def progress(p):
+            stage, n = p
+            if stage == "copy": bar.note(f"{fname}: {n / 1048576:.1f} MB copied")
+            else: bar.note(f"{fname}: {n:,} rows converted to Parquet")
+        def done(res):
+            rows, size = res
+            messagebox.showinfo("Export Complete", f"{rows:,} row(s) exported to {path} ({size / 1048576:.1f} MB).")
+        self.run_async(lambda conn, job: exporter.export_query(conn, sql, params, path, job), done,
+                       err_title="Export Error", tab=tab, text=f"Exporting {fname}...", on_progress=progress)
+
+    def load_table(self, tree, name, query=None):
+        # Bounded-memory load: the tree pages through queries.TABLES[name] (or a filtered query) as it is scrolled
+        query = query or queries.TABLES[name]
+        if tree not in self.pagers:
+            submit = lambda work, done, failed: self.run_async(work, done, err_title="Read Error", tab=self.tree_tab[tree], on_stop=failed)
+            self.pagers[tree] = TreePager(tree, self.tree_scroll[tree], query, submit, PAGE_SIZE, MAX_TREE_ROWS, cache=self.cache)
+        self.pagers[tree].query = query
+        self.pagers[tree].reload()
 
     def mk_tree(self, parent, cols, style):
         # Added a scrollbar for better UX
@@ -117,6 +318,11 @@ class UniversityApp:
         
         tv.pack(side="left", expand=True, fill="both")
         sb.pack(side="right", fill="y")
+        self.tree_tab[tv] = parent
+        self.tree_scroll[tv] = sb
+        menu = Menu(tv, tearoff=0)
+        menu.add_command(label="Export...", command=lambda: self.export_tree(tv))
+        tv.bind("<Button-3>", lambda e: menu.tk_popup(e.x_root, e.y_root))
         return tv
 
     def mk_ent(self, parent, txt, col):
@@ -154,17 +360,35 @@ class UniversityApp:
         btn_test.pack(pady=30)
         self.lbl_status = ttk.Label(self.tab_home, text="System Status: Ready", bootstyle="secondary", font=("Arial", 12))
         self.lbl_status.pack()
+        self.lbl_cache = ttk.Label(self.tab_home, text="", bootstyle="secondary", font=("Arial", 10))
+        self.lbl_cache.pack(pady=5)
+        self.lbl_startup = ttk.Label(self.tab_home, text="", bootstyle="secondary", font=("Arial", 10))
+        self.lbl_startup.pack()
 
     def test_db(self):
-        conn = db_connection.get_connection()
-        if conn: 
-            dsn = conn.get_dsn_parameters()
-            db_name = dsn.get('dbname')
-            self.lbl_status.config(text=f"Connected to: {db_name}", bootstyle="success")
-            messagebox.showinfo("Connected", f"Successfully connected to database: {db_name}")
-            conn.close()
-        else: 
+        def done(db_name):
+            st = db_connection.get_pool().snapshot()
+            self.lbl_status.config(text=f"Connected to: {db_name}  |  Pool: {st['in_use']} in use, {st['idle']} idle (max {st['max']})", bootstyle="success")
+            messagebox.showinfo("Connected", f"Successfully connected to database: {db_name}\n\n"
+                                f"Connections opened: {st['created']}  Checkouts: {st['checkouts']}  Returns: {st['returns']}\n"
+                                f"Waits: {st['waits']}  Recycled: {st['recycled']}  Health failures: {st['health_failures']}")
+        def failed(e):
             self.lbl_status.config(text="Connection Failed", bootstyle="danger")
+            messagebox.showerror("Connection Error", f"Error connecting to DB: {e}")
+        self.run_async(lambda conn, job: conn.get_dsn_parameters().get('dbname'), done, tab=self.tab_home, text="Connecting...", on_error=failed)
+
+    def show_cache_stats(self):
+        st = self.cache.snapshot()
+        looked_up = st["hits"] + st["misses"]
+        rate = f" ({100 * st['hits'] / looked_up:.0f}% hits)" if looked_up else ""
+        self.lbl_cache.config(text=f"Query cache: {st['hits']} hits, {st['misses']} misses{rate}  |  "
+                                   f"{st['entries']} results, {st['bytes'] / 1048576:.1f} of {st['max_bytes'] / 1048576:.0f} MB")
+        self.root.after(2000, self.show_cache_stats)
+
+    def on_close(self):
+        self.listener.stop()
+        self.runner.shutdown()
+        self.root.destroy()
 
     # ==========================
     #   CRUD TABS (Full CRUD)
@@ -182,6 +406,7 @@ class UniversityApp:
         ttk.Button(f, text="Update", bootstyle="warning", command=self.upd_stud, width=10).pack(side="left", padx=5)
         ttk.Button(f, text="Delete", bootstyle="danger", command=self.del_stud, width=10).pack(side="left", padx=5)
         ttk.Button(f, text="Clear", bootstyle="secondary", command=self.load_stud, width=8).pack(side="left", padx=5)
+        ttk.Button(f, text="Import CSV", bootstyle="info-outline", command=lambda: self.import_csv("Student", self.load_stud), width=11).pack(side="left", padx=5)
         
         self.tr_stud = self.mk_tree(p, ["ID","First Name","Last Name","Group","Section"], "success")
         self.tr_stud.bind("<<TreeviewSelect>>", self.fill_stud)
@@ -197,10 +422,10 @@ class UniversityApp:
             self.e_grp.delete(0,'end'); self.e_grp.insert(0,v[3])
             self.e_sec.delete(0,'end'); self.e_sec.insert(0,v[4])
 
-    def load_stud(self): self.run_query("SELECT student_id, first_name, last_name, academic_group, section FROM Student ORDER BY student_id", self.tr_stud)
-    def add_stud(self): self.execute_sql("INSERT INTO Student (student_id, first_name, last_name, academic_group, section, dob) VALUES (%s,%s,%s,%s,%s, CURRENT_DATE)", (self.e_sid.get(), self.e_sfn.get(), self.e_sln.get(), self.e_grp.get(), self.e_sec.get()), self.load_stud)
-    def upd_stud(self): self.execute_sql("UPDATE Student SET first_name=%s, last_name=%s, academic_group=%s, section=%s WHERE student_id=%s", (self.e_sfn.get(), self.e_sln.get(), self.e_grp.get(), self.e_sec.get(), self.e_sid.get()), self.load_stud)
-    def del_stud(self): self.execute_sql("DELETE FROM Student WHERE student_id=%s", (self.e_sid.get(),), self.load_stud)
+    def load_stud(self): self.load_table(self.tr_stud, "students")
+    def add_stud(self): self.execute_sql("INSERT INTO Student (student_id, first_name, last_name, academic_group, section, dob) VALUES (%s,%s,%s,%s,%s, CURRENT_DATE)", (self.e_sid.get(), self.e_sfn.get(), self.e_sln.get(), self.e_grp.get(), self.e_sec.get()), tree=self.tr_stud)
+    def upd_stud(self): self.execute_sql("UPDATE Student SET first_name=%s, last_name=%s, academic_group=%s, section=%s WHERE student_id=%s", (self.e_sfn.get(), self.e_sln.get(), self.e_grp.get(), self.e_sec.get(), self.e_sid.get()), tree=self.tr_stud)
+    def del_stud(self): self.execute_sql("DELETE FROM Student WHERE student_id=%s", (self.e_sid.get(),), tree=self.tr_stud)
 
     # 2. INSTRUCTORS
     def build_instructors(self, p):
@@ -231,10 +456,10 @@ class UniversityApp:
             self.c_irank.set(v[3])
             self.e_idept.delete(0,'end'); self.e_idept.insert(0,v[4])
 
-    def load_inst(self): self.run_query("SELECT instructor_id, first_name, last_name, rank, department_id FROM Instructor ORDER BY instructor_id", self.tr_inst)
-    def add_inst(self): self.execute_sql("INSERT INTO Instructor (instructor_id, department_id, last_name, first_name, rank) VALUES (%s,%s,%s,%s,%s)", (self.e_iid.get(), self.e_idept.get(), self.e_iln.get(), self.e_ifn.get(), self.c_irank.get()), self.load_inst)
-    def upd_inst(self): self.execute_sql("UPDATE Instructor SET first_name=%s, last_name=%s, rank=%s, department_id=%s WHERE instructor_id=%s", (self.e_ifn.get(), self.e_iln.get(), self.c_irank.get(), self.e_idept.get(), self.e_iid.get()), self.load_inst)
-    def del_inst(self): self.execute_sql("DELETE FROM Instructor WHERE instructor_id=%s", (self.e_iid.get(),), self.load_inst)
+    def load_inst(self): self.load_table(self.tr_inst, "instructors")
+    def add_inst(self): self.execute_sql("INSERT INTO Instructor (instructor_id, department_id, last_name, first_name, rank) VALUES (%s,%s,%s,%s,%s)", (self.e_iid.get(), self.e_idept.get(), self.e_iln.get(), self.e_ifn.get(), self.c_irank.get()), tree=self.tr_inst)
+    def upd_inst(self): self.execute_sql("UPDATE Instructor SET first_name=%s, last_name=%s, rank=%s, department_id=%s WHERE instructor_id=%s", (self.e_ifn.get(), self.e_iln.get(), self.c_irank.get(), self.e_idept.get(), self.e_iid.get()), tree=self.tr_inst)
+    def del_inst(self): self.execute_sql("DELETE FROM Instructor WHERE instructor_id=%s", (self.e_iid.get(),), tree=self.tr_inst)
 
     # 3. DEPARTMENTS
     def build_departments(self, p):
@@ -255,10 +480,10 @@ class UniversityApp:
         s = self.tr_dept.selection()
         if s: v = self.tr_dept.item(s)['values']; self.e_did.delete(0,'end'); self.e_did.insert(0,v[0]); self.e_dnm.delete(0,'end'); self.e_dnm.insert(0,v[1])
 
-    def load_dept(self): self.run_query("SELECT * FROM Department ORDER BY department_id", self.tr_dept)
-    def add_dept(self): self.execute_sql("INSERT INTO Department VALUES (%s,%s)", (self.e_did.get(), self.e_dnm.get()), self.load_dept)
-    def upd_dept(self): self.execute_sql("UPDATE Department SET name=%s WHERE department_id=%s", (self.e_dnm.get(), self.e_did.get()), self.load_dept)
-    def del_dept(self): self.execute_sql("DELETE FROM Department WHERE department_id=%s", (self.e_did.get(),), self.load_dept)
+    def load_dept(self): self.load_table(self.tr_dept, "departments")
+    def add_dept(self): self.execute_sql("INSERT INTO Department VALUES (%s,%s)", (self.e_did.get(), self.e_dnm.get()), tree=self.tr_dept)
+    def upd_dept(self): self.execute_sql("UPDATE Department SET name=%s WHERE department_id=%s", (self.e_dnm.get(), self.e_did.get()), tree=self.tr_dept)
+    def del_dept(self): self.execute_sql("DELETE FROM Department WHERE department_id=%s", (self.e_did.get(),), tree=self.tr_dept)
 
     # 4. COURSES
     def build_courses(self, p):
@@ -279,10 +504,10 @@ class UniversityApp:
         s = self.tr_cour.selection()
         if s: v = self.tr_cour.item(s)['values']; self.e_cid.delete(0,'end'); self.e_cid.insert(0,v[0]); self.e_cdept.delete(0,'end'); self.e_cdept.insert(0,v[1]); self.e_cnm.delete(0,'end'); self.e_cnm.insert(0,v[2])
 
-    def load_cour(self): self.run_query("SELECT course_id, department_id, name FROM Course ORDER BY course_id", self.tr_cour)
-    def add_cour(self): self.execute_sql("INSERT INTO Course (course_id, name, department_id) VALUES (%s,%s,%s)", (self.e_cid.get(), self.e_cnm.get(), self.e_cdept.get()), self.load_cour)
-    def upd_cour(self): self.execute_sql("UPDATE Course SET name=%s WHERE course_id=%s AND department_id=%s", (self.e_cnm.get(), self.e_cid.get(), self.e_cdept.get()), self.load_cour)
-    def del_cour(self): self.execute_sql("DELETE FROM Course WHERE course_id=%s AND department_id=%s", (self.e_cid.get(), self.e_cdept.get()), self.load_cour)
+    def load_cour(self): self.load_table(self.tr_cour, "courses")
+    def add_cour(self): self.execute_sql("INSERT INTO Course (course_id, name, department_id) VALUES (%s,%s,%s)", (self.e_cid.get(), self.e_cnm.get(), self.e_cdept.get()), tree=self.tr_cour)
+    def upd_cour(self): self.execute_sql("UPDATE Course SET name=%s WHERE course_id=%s AND department_id=%s", (self.e_cnm.get(), self.e_cid.get(), self.e_cdept.get()), tree=self.tr_cour)
+    def del_cour(self): self.execute_sql("DELETE FROM Course WHERE course_id=%s AND department_id=%s", (self.e_cid.get(), self.e_cdept.get()), tree=self.tr_cour)
 
     # 5. ROOMS
     def build_rooms(self, p):
@@ -303,10 +528,10 @@ class UniversityApp:
         s = self.tr_rm.selection()
         if s: v = self.tr_rm.item(s)['values']; self.e_rb.delete(0,'end'); self.e_rb.insert(0,v[0]); self.e_rn.delete(0,'end'); self.e_rn.insert(0,v[1]); self.e_rc.delete(0,'end'); self.e_rc.insert(0,v[2])
 
-    def load_rm(self): self.run_query("SELECT * FROM Room", self.tr_rm)
-    def add_rm(self): self.execute_sql("INSERT INTO Room VALUES (%s,%s,%s)", (self.e_rb.get(), self.e_rn.get(), self.e_rc.get()), self.load_rm)
-    def upd_rm(self): self.execute_sql("UPDATE Room SET capacity=%s WHERE building=%s AND roomno=%s", (self.e_rc.get(), self.e_rb.get(), self.e_rn.get()), self.load_rm)
-    def del_rm(self): self.execute_sql("DELETE FROM Room WHERE building=%s AND roomno=%s", (self.e_rb.get(), self.e_rn.get()), self.load_rm)
+    def load_rm(self): self.load_table(self.tr_rm, "rooms")
+    def add_rm(self): self.execute_sql("INSERT INTO Room VALUES (%s,%s,%s)", (self.e_rb.get(), self.e_rn.get(), self.e_rc.get()), tree=self.tr_rm)
+    def upd_rm(self): self.execute_sql("UPDATE Room SET capacity=%s WHERE building=%s AND roomno=%s", (self.e_rc.get(), self.e_rb.get(), self.e_rn.get()), tree=self.tr_rm)
+    def del_rm(self): self.execute_sql("DELETE FROM Room WHERE building=%s AND roomno=%s", (self.e_rb.get(), self.e_rn.get()), tree=self.tr_rm)
 
     # ==========================
     #   ACADEMIC TABS
@@ -314,17 +539,91 @@ class UniversityApp:
     
     def build_reservations(self, p):
         f = ttk.Labelframe(p, text="Reservations", padding=15, bootstyle="danger"); f.pack(fill="x", padx=10, pady=5)
-        self.e_rid = self.mk_ent(f, "Res ID:",0); self.e_rins = self.mk_ent(f, "Inst ID:",2); self.e_rcid = self.mk_ent(f, "Course ID:",4)
+        self.e_rins = self.mk_ent(f, "Inst ID:",0); self.e_rcid = self.mk_ent(f, "Course ID:",2); self.e_rdid = self.mk_ent(f, "Dept ID:",4)
+        self.e_rdid.insert(0, "1")
         
         ttk.Button(f, text="Add", bootstyle="danger", command=self.add_res, width=10).pack(side="left", padx=5)
+        # New reservations take their id from the sequence: the id is only needed to delete one
+        ttk.Separator(f, orient="vertical").pack(side="left", fill="y", padx=10)
+        self.e_rid = self.mk_ent(f, "Res ID (Delete):",6)
         ttk.Button(f, text="Delete", bootstyle="secondary", command=self.del_res, width=10).pack(side="left", padx=5)
-        self.tr_res = self.mk_tree(p, ["ID","Instructor","Course","Date","Time"], "danger")
-        self.tr_res.bind("<<TreeviewSelect>>", lambda e: self.e_rid.insert(0, self.tr_res.item(self.tr_res.selection())['values'][0]))
+
+        # Slot: date and times are shared by the free-room search and the booking; Weeks > 1 books a weekly series
+        f = ttk.Labelframe(p, text="Time Slot", padding=15, bootstyle="danger"); f.pack(fill="x", padx=10, pady=5)
+        self.e_rbld = self.mk_ent(f, "Building:",0); self.e_rroom = self.mk_ent(f, "Room:",2); self.e_rdate = self.mk_ent(f, "Date:",4)
+        self.e_rstart = self.mk_ent(f, "Start:",6); self.e_rend = self.mk_ent(f, "End:",8); self.e_rweeks = self.mk_ent(f, "Weeks:",10)
+        self.e_rdate.insert(0, datetime.date.today().isoformat()); self.e_rstart.insert(0, "08:30"); self.e_rend.insert(0, "10:00"); self.e_rweeks.insert(0, "1")
+
+        f = ttk.Labelframe(p, text="Find a Free Room", padding=15, bootstyle="danger"); f.pack(fill="x", padx=10, pady=5)
+        self.e_rcap = self.mk_ent(f, "Min Capacity:",0)
+        ttk.Button(f, text="Search", bootstyle="danger-outline", command=self.find_free_rooms, width=10).pack(side="left", padx=5)
+        self.tr_free = ttk.Treeview(f, columns=["Building","Room","Capacity"], show="headings", height=4, bootstyle="danger")
+        for c in ["Building","Room","Capacity"]: self.tr_free.heading(c, text=c); self.tr_free.column(c, anchor="center", width=120)
+        self.tr_free.pack(side="left", padx=15)
+        self.tr_free.bind("<<TreeviewSelect>>", self.fill_res_room)
+
+        self.tr_res = self.mk_tree(p, ["ID","Building","Room","Instructor","Course","Date","Start","End"], "danger")
+        self.tr_res.bind("<<TreeviewSelect>>", self.fill_res_id)
         self.load_res()
 
-    def load_res(self): self.run_query("SELECT reservation_id, instructor_id, course_id, reserv_date, start_time FROM Reservation", self.tr_res)
-    def add_res(self): self.execute_sql("INSERT INTO Reservation (reservation_id, instructor_id, course_id, department_id, building, roomno, reserv_date, hours_number) VALUES (%s,%s,%s,1,'B','020',CURRENT_DATE,1)", (self.e_rid.get(), self.e_rins.get(), self.e_rcid.get()), self.load_res)
-    def del_res(self): self.execute_sql("DELETE FROM Reservation WHERE reservation_id=%s", (self.e_rid.get(),), self.load_res)
+    def load_res(self): self.load_table(self.tr_res, "reservations")
+
+    def fill_res_id(self, e):
+        s = self.tr_res.selection()
+        if s: self.e_rid.delete(0,'end'); self.e_rid.insert(0, self.tr_res.item(s)['values'][0])
+
+    def res_slot(self):
+        # (date, start, end, weeks) from the Time Slot fields, or None after telling the user what is wrong
+        try:
+            day = datetime.date.fromisoformat(self.e_rdate.get().strip())
+            start, end = (datetime.time.fromisoformat(e.get().strip()) for e in (self.e_rstart, self.e_rend))
+            weeks = int(self.e_rweeks.get().strip() or 1)
+        except ValueError:
+            messagebox.showwarning("Reservations", "Enter the date as YYYY-MM-DD, times as HH:MM and a whole number of weeks.")
+            return None
+        if start >= end or weeks < 1:
+            messagebox.showwarning("Reservations", "The end time must be after the start time, and Weeks at least 1.")
+            return None
+        return day, start, end, weeks
+
+    def find_free_rooms(self):
+        slot = self.res_slot()
+        if not slot: return
+        day, start, end, _ = slot
+        cap = self.e_rcap.get().strip()
+        if cap and not cap.isdigit(): return messagebox.showwarning("Reservations", "Min Capacity must be a number.")
+        def done(rows):
+            self.tr_free.delete(*self.tr_free.get_children())
+            for row in rows: self.tr_free.insert("", "end", values=row)
+            if not rows: messagebox.showinfo("Reservations", "No free room matches this slot.")
+        self.run_async(lambda conn, job: queries.find_free_rooms(conn, day, start, end, int(cap or 0)), done,
+                       err_title="Read Error", tab=self.t_res, text="Searching free rooms...")
+
+    def fill_res_room(self, event):
+        sel = self.tr_free.selection()
+        if sel:
+            vals = self.tr_free.item(sel)['values']
+            self.e_rbld.delete(0,'end'); self.e_rbld.insert(0, vals[0])
+            self.e_rroom.delete(0,'end'); self.e_rroom.insert(0, vals[1])
+
+    def add_res(self):
+        slot = self.res_slot()
+        if not slot: return
+        day, start, end, weeks = slot
+        bld, room = self.e_rbld.get().strip(), self.e_rroom.get().strip()
+        args = (bld, room, self.e_rcid.get().strip(), self.e_rdid.get().strip(), self.e_rins.get().strip(), day, start, end, weeks)
+        def done(rows):
+            messagebox.showinfo("Success", f"{len(rows)} reservation(s) booked in room {bld}-{room}.")
+            self.cache.invalidate({"reservation"})
+            self.pagers[self.tr_res].patch("INSERT", rows)
+        def failed(e):
+            if isinstance(e, queries.ReservationConflict):
+                messagebox.showerror("Room Not Available", f"Room {bld}-{room} is already booked at that time on:\n" +
+                                     "\n".join(f"{d} (reservation {rid})" for d, rid in e.clashes) + "\n\nNothing was booked.")
+            else: messagebox.showerror("Database Error", f"Operation Failed:\n{e}")
+        self.run_async(lambda conn, job: queries.book_weekly(conn, *args), done, tab=self.t_res, text="Booking...", on_error=failed)
+
+    def del_res(self): self.execute_sql("DELETE FROM Reservation WHERE reservation_id=%s", (self.e_rid.get(),), tree=self.tr_res)
 
     def build_enrollment(self, p):
         f = ttk.Labelframe(p, text="Student Enrollment", padding=15); f.pack(fill="x", padx=10, pady=5)
@@ -332,6 +631,7 @@ class UniversityApp:
         
         ttk.Button(f, text="Enroll", bootstyle="success", command=self.add_enr, width=10).pack(side="left", padx=5)
         ttk.Button(f, text="Unenroll", bootstyle="danger", command=self.del_enr, width=10).pack(side="left", padx=5)
+        ttk.Button(f, text="Import CSV", bootstyle="info-outline", command=lambda: self.import_csv("Enrollment", self.load_enr), width=11).pack(side="left", padx=5)
         self.tr_enr = self.mk_tree(p, ["Student ID","Course ID","Dept ID","Enroll Date"], "secondary")
         self.tr_enr.bind("<<TreeviewSelect>>", self.fill_enroll_form)
         self.load_enr()
@@ -344,9 +644,9 @@ class UniversityApp:
             self.e_ecid.delete(0,'end'); self.e_ecid.insert(0, vals[1])
             self.e_edid.delete(0,'end'); self.e_edid.insert(0, vals[2])
 
-    def load_enr(self): self.run_query("SELECT student_id, course_id, department_id, enrollment_date FROM Enrollment", self.tr_enr)
-    def add_enr(self): self.execute_sql("INSERT INTO Enrollment (student_id, course_id, department_id) VALUES (%s,%s,%s)", (self.e_esid.get(), self.e_ecid.get(), self.e_edid.get()), self.load_enr)
-    def del_enr(self): self.execute_sql("DELETE FROM Enrollment WHERE student_id=%s AND course_id=%s", (self.e_esid.get(), self.e_ecid.get()), self.load_enr)
+    def load_enr(self): self.load_table(self.tr_enr, "enrollment")
+    def add_enr(self): self.execute_sql("INSERT INTO Enrollment (student_id, course_id, department_id) VALUES (%s,%s,%s)", (self.e_esid.get(), self.e_ecid.get(), self.e_edid.get()), tree=self.tr_enr)
+    def del_enr(self): self.execute_sql("DELETE FROM Enrollment WHERE student_id=%s AND course_id=%s", (self.e_esid.get(), self.e_ecid.get()), tree=self.tr_enr)
 
     def build_marks(self, p):
         f = ttk.Labelframe(p, text="Student Marks", padding=15); f.pack(fill="x", padx=10, pady=5)
@@ -355,6 +655,7 @@ class UniversityApp:
         ttk.Button(f, text="Add", bootstyle="success", command=self.add_mrk, width=10).pack(side="left", padx=5)
         ttk.Button(f, text="Update", bootstyle="warning", command=self.upd_mrk, width=10).pack(side="left", padx=5)
         ttk.Button(f, text="Delete", bootstyle="danger", command=self.del_mrk, width=10).pack(side="left", padx=5)
+        ttk.Button(f, text="Import CSV", bootstyle="info-outline", command=lambda: self.import_csv("Marks", self.load_mrk), width=11).pack(side="left", padx=5)
         self.tr_mrk = self.mk_tree(p, ["Mark ID","Student ID","Course ID","Value"], "secondary")
         self.tr_mrk.bind("<<TreeviewSelect>>", self.fill_mark_form)
         self.load_mrk()
@@ -368,24 +669,72 @@ class UniversityApp:
             self.e_mcid.delete(0,'end'); self.e_mcid.insert(0, vals[2])
             self.e_mval.delete(0,'end'); self.e_mval.insert(0, vals[3])
 
-    def load_mrk(self): self.run_query("SELECT mark_id, student_id, course_id, mark_value FROM Marks", self.tr_mrk)
-    def add_mrk(self): self.execute_sql("INSERT INTO Marks (student_id, course_id, department_id, mark_value) VALUES (%s,%s,1,%s)", (self.e_msid.get(), self.e_mcid.get(), self.e_mval.get()), self.load_mrk)
-    def upd_mrk(self): self.execute_sql("UPDATE Marks SET mark_value=%s WHERE mark_id=%s", (self.e_mval.get(), self.e_mid.get()), self.load_mrk)
-    def del_mrk(self): self.execute_sql("DELETE FROM Marks WHERE mark_id=%s", (self.e_mid.get(),), self.load_mrk)
+    def load_mrk(self): self.load_table(self.tr_mrk, "marks")
+    def add_mrk(self): self.execute_sql("INSERT INTO Marks (student_id, course_id, department_id, mark_value) VALUES (%s,%s,1,%s)", (self.e_msid.get(), self.e_mcid.get(), self.e_mval.get()), tree=self.tr_mrk)
+    def upd_mrk(self): self.execute_sql("UPDATE Marks SET mark_value=%s WHERE mark_id=%s", (self.e_mval.get(), self.e_mid.get()), tree=self.tr_mrk)
+    def del_mrk(self): self.execute_sql("DELETE FROM Marks WHERE mark_id=%s", (self.e_mid.get(),), tree=self.tr_mrk)
 
     def build_attendance(self, p):
         f = ttk.Labelframe(p, text="Attendance Log", padding=15, bootstyle="secondary"); f.pack(fill="x", padx=10, pady=5)
         self.e_asid = self.mk_ent(f, "Student ID:",0); self.e_acid = self.mk_ent(f, "Course ID:",2)
         ttk.Label(f, text="Status:", font=("Arial", 10, "bold")).pack(side="left", padx=5)
-        self.c_ast = ttk.Combobox(f, values=["Present","Absent","Late"], width=10); self.c_ast.pack(side="left", padx=5); self.c_ast.current(0)
+        self.c_ast = ttk.Combobox(f, values=queries.ATTENDANCE_STATUSES, width=10); self.c_ast.pack(side="left", padx=5); self.c_ast.current(0)
         
         ttk.Button(f, text="Log", bootstyle="primary", command=self.add_att, width=10).pack(side="left", padx=5)
         ttk.Button(f, text="Update", bootstyle="warning", command=self.update_attendance, width=10).pack(side="left", padx=5)
         ttk.Button(f, text="Delete", bootstyle="danger", command=self.del_attendance, width=10).pack(side="left", padx=5)
+        ttk.Button(f, text="Import CSV", bootstyle="info-outline", command=lambda: self.import_csv("Attendance", self.load_att), width=11).pack(side="left", padx=5)
         self.tr_att = self.mk_tree(p, ["Att ID","Student ID","Course ID","Date","Status"], "secondary")
         self.tr_att.bind("<<TreeviewSelect>>", self.fill_att_form)
+        self.build_roll_call(p)
         self.load_att()
 
+    def build_roll_call(self, p):
+        # Group roll call: list a whole group/section for a course, toggle statuses, submit in one batch
+        rc = ttk.Labelframe(p, text="Roll Call", padding=10, bootstyle="primary"); rc.pack(expand=True, fill="both", padx=10, pady=5)
+        f = ttk.Frame(rc); f.pack(fill="x")
+        self.c_rc_by = ttk.Combobox(f, values=["Group","Section"], width=8, state="readonly"); self.c_rc_by.pack(side="left", padx=5); self.c_rc_by.current(0)
+        self.e_rc_name = self.mk_ent(f, "Name:",0); self.e_rc_cid = self.mk_ent(f, "Course ID:",2); self.e_rc_date = self.mk_ent(f, "Date:",4)
+        self.e_rc_date.insert(0, datetime.date.today().isoformat())
+        ttk.Button(f, text="Load Roll", bootstyle="info", command=self.load_roll_call, width=10).pack(side="left", padx=5)
+        ttk.Separator(f, orient='vertical').pack(side="left", padx=10, fill='y')
+        for st, style in (("Present","success"), ("Absent","danger"), ("Late","warning"), ("Excused","secondary")):
+            ttk.Button(f, text=st, bootstyle=style+"-outline", command=lambda st=st: self.set_roll_status(st), width=8).pack(side="left", padx=2)
+        ttk.Button(f, text="Submit Roll Call", bootstyle="primary", command=self.submit_roll_call, width=16).pack(side="right", padx=5)
+        self.tr_roll = self.mk_tree(rc, ["Student ID","First Name","Last Name","Status"], "primary")
+        # Double-click cycles a student through the statuses; the buttons set every selected student at once
+        self.tr_roll.bind("<Double-1>", lambda e: self.cycle_roll_status(self.tr_roll.identify_row(e.y)))
+
+    def load_roll_call(self):
+        by, name = self.c_rc_by.get().lower(), self.e_rc_name.get().strip()
+        if not name: return messagebox.showwarning("Roll Call", f"Enter a {by} name.")
+        def done(rows):
+            self.tr_roll.delete(*self.tr_roll.get_children())
+            for r in rows: self.tr_roll.insert("", "end", values=(*r, "Present"))
+            if not rows: messagebox.showinfo("Roll Call", f"No students found in {by} '{name}'.")
+        self.run_async(lambda conn, job: queries.roll_call_students(conn, by, name), done, err_title="Read Error", tab=self.t_att, text="Loading roll...")
+
+    def set_roll_status(self, status):
+        for iid in self.tr_roll.selection(): self.tr_roll.set(iid, "Status", status)
+
+    def cycle_roll_status(self, iid):
+        if not iid: return
+        i = queries.ATTENDANCE_STATUSES.index(self.tr_roll.set(iid, "Status"))
+        self.tr_roll.set(iid, "Status", queries.ATTENDANCE_STATUSES[(i + 1) % len(queries.ATTENDANCE_STATUSES)])
+
+    def submit_roll_call(self):
+        roll = [(self.tr_roll.set(iid, "Student ID"), self.tr_roll.set(iid, "Status")) for iid in self.tr_roll.get_children()]
+        course, day = self.e_rc_cid.get().strip(), self.e_rc_date.get().strip()
+        if not roll or not course: return messagebox.showwarning("Roll Call", "Load a roll and enter the Course ID first.")
+        def done(ids):
+            messagebox.showinfo("Roll Call", f"Attendance recorded for {len(ids)} student(s).")
+            self.tr_roll.delete(*self.tr_roll.get_children())
+            self.cache.invalidate(with_triggers({"attendance"}))
+            self.load_att()
+            self.tail_audit()
+        self.run_async(lambda conn, job: queries.record_roll_call(conn, course, day, roll), done, tab=self.t_att, text="Saving roll call...",
+                       on_error=lambda e: messagebox.showerror("Database Error", f"Roll call was not saved:\n{e}"))
+
     def fill_att_form(self, event):
         sel = self.tr_att.selection()
         if sel:
@@ -395,26 +744,39 @@ class UniversityApp:
             self.e_acid.delete(0,'end'); self.e_acid.insert(0, vals[2])
             self.c_ast.set(vals[4])
 
-    def load_att(self): self.run_query("SELECT attendance_id, student_id, course_id, attendance_date, status FROM Attendance", self.tr_att)
-    def add_att(self): self.execute_sql("INSERT INTO Attendance (student_id, course_id, status) VALUES (%s,%s,%s)", (self.e_asid.get(), self.e_acid.get(), self.c_ast.get()), self.load_att)
+    def load_att(self): self.load_table(self.tr_att, "attendance")
+    def add_att(self): self.execute_sql("INSERT INTO Attendance (student_id, course_id, status) VALUES (%s,%s,%s)", (self.e_asid.get(), self.e_acid.get(), self.c_ast.get()), tree=self.tr_att)
     def update_attendance(self): 
-        if hasattr(self, 'att_id_temp'): self.execute_sql("UPDATE Attendance SET status=%s WHERE attendance_id=%s", (self.c_ast.get(), self.att_id_temp), self.load_att)
+        if hasattr(self, 'att_id_temp'): self.execute_sql("UPDATE Attendance SET status=%s WHERE attendance_id=%s", (self.c_ast.get(), self.att_id_temp), tree=self.tr_att)
     def del_attendance(self): 
-        if hasattr(self, 'att_id_temp'): self.execute_sql("DELETE FROM Attendance WHERE attendance_id=%s", (self.att_id_temp,), self.load_att)
+        if hasattr(self, 'att_id_temp'): self.execute_sql("DELETE FROM Attendance WHERE attendance_id=%s", (self.att_id_temp,), tree=self.tr_att)
 
     def build_grading(self, p):
         f = ttk.Labelframe(p, text="Deliberation / Results", padding=15, bootstyle="success"); f.pack(fill="x", padx=10, pady=5)
         ttk.Button(f, text="Process Results", bootstyle="success", command=self.proc_grade, width=20).pack(side="left", padx=10)
-        self.tr_grade = self.mk_tree(p, ["Student ID","Course ID","Mark","Status"], "success")
+        self.v_full_grade = ttk.BooleanVar(value=False)
+        ttk.Checkbutton(f, text="Full recompute", variable=self.v_full_grade, bootstyle="success-round-toggle").pack(side="left", padx=10)
+        self.lbl_grade = ttk.Label(f, text="", font=("Arial", 10, "italic")); self.lbl_grade.pack(side="left", padx=10)
+        self.tr_grade = self.mk_tree(p, ["Student ID","Course ID","Dept ID","Final Mark","Pass Mark","Status"], "success")
 
     def proc_grade(self):
-        for r in self.tr_grade.get_children(): self.tr_grade.delete(r)
-        conn = db_connection.get_connection()
-        if conn:
-            cur = conn.cursor(); cur.execute("SELECT student_id, course_id, mark_value FROM Marks"); rows = cur.fetchall(); conn.close()
-            for r in rows:
-                status = "PASS" if float(r[2]) >= 10 else "FAIL"
-                self.tr_grade.insert("", "end", values=(r[0], r[1], r[2], status))
+        # PASS/FAIL is decided in SQL against each course's failing_grade; only changed results are recomputed
+        full = self.v_full_grade.get()
+        self.tr_grade.delete(*self.tr_grade.get_children())
+        def work(conn, job):
+            changed = queries.refresh_results(conn, full)
+            total = 0
+            for rows in queries.iter_results(conn):
+                job.check()
+                job.progress(rows)
+                total += len(rows)
+            return changed, total
+        def add_rows(rows):
+            for r in rows: self.tr_grade.insert("", "end", values=r)
+        def done(res):
+            self.tree_sources[self.tr_grade] = queries.results_select()
+            self.lbl_grade.config(text=f"{res[1]} results ({res[0]} recomputed)")
+        self.run_async(work, done, tab=self.t_grade, text="Processing results...", on_progress=add_rows)
 
     # ==========================
     #   REPORTS & AUDIT
@@ -425,24 +787,125 @@ class UniversityApp:
         
         ttk.Button(f, text="(a) By Group", bootstyle="warning", width=18, command=lambda: self.run_rep("get_students_by_group", "Group")).grid(row=0,column=0,padx=15, pady=10)
         ttk.Button(f, text="(b) By Section", bootstyle="info", width=18, command=lambda: self.run_rep("get_students_by_section", "Section")).grid(row=0,column=1,padx=15, pady=10)
-        ttk.Button(f, text="(h) Failing Students", bootstyle="danger", width=18, command=lambda: self.run_query("SELECT * FROM get_failing_students()", self.tr_query)).grid(row=0,column=2,padx=15, pady=10)
-        ttk.Button(f, text="(i) Resit Eligible", bootstyle="primary", width=18, command=lambda: self.run_query("SELECT * FROM get_resit_students()", self.tr_query)).grid(row=0,column=3,padx=15, pady=10)
-        ttk.Button(f, text="(j) Excluded List", bootstyle="secondary", width=18, command=lambda: self.run_query("SELECT * FROM get_excluded_students()", self.tr_query)).grid(row=0,column=4,padx=15, pady=10)
+        ttk.Button(f, text="(h) Failing Students", bootstyle="danger", width=18, command=lambda: self.report("get_failing_students")).grid(row=0,column=2,padx=15, pady=10)
+        ttk.Button(f, text="(i) Resit Eligible", bootstyle="primary", width=18, command=lambda: self.report("get_resit_students")).grid(row=0,column=3,padx=15, pady=10)
+        ttk.Button(f, text="(j) Excluded List", bootstyle="secondary", width=18, command=lambda: self.report("get_excluded_students")).grid(row=0,column=4,padx=15, pady=10)
+        # Large reports can go straight to a file instead of the table below
+        self.v_rep_export = ttk.BooleanVar(value=False)
+        ttk.Checkbutton(f, text="Export to file instead of showing", variable=self.v_rep_export, bootstyle="warning-round-toggle").grid(row=1,column=0,columnspan=2,padx=15,sticky="w")
+        ttk.Button(f, text="Export Shown Report...", bootstyle="warning-outline", width=22, command=lambda: self.export_tree(self.tr_query)).grid(row=1,column=4,padx=15)
         
         self.tr_query = self.mk_tree(p, [], "warning")
 
+    def report(self, func, params=()):
+        sql = f"SELECT * FROM {func}({', '.join(['%s'] * len(params))})"
+        if self.v_rep_export.get(): self.export_query(sql, params, func, self.tab_queries)
+        else: self.run_query(sql, self.tr_query, params)
+
     def run_rep(self, func, prompt):
         val = simpledialog.askstring("Report Parameter", f"Enter {prompt} Name:")
-        if val: self.run_query(f"SELECT * FROM {func}(%s)", self.tr_query, (val,))
+        if val: self.report(func, (val,))
 
     def build_audit_tab(self, p):
-        ttk.Button(p, text="Refresh Audit Logs", bootstyle="dark", command=self.load_audit, width=20).pack(pady=10)
+        f = ttk.Frame(p); f.pack(pady=10)
+        # Date range: only the monthly partitions it covers are read. To is left open by default,
+        # otherwise a tab kept open past midnight would stop showing new entries.
+        self.e_audit_from = self.mk_ent(f, "From:",0); self.e_audit_to = self.mk_ent(f, "To:",2)
+        self.e_audit_from.insert(0, (datetime.date.today() - datetime.timedelta(days=30)).isoformat())
+        ttk.Button(f, text="Refresh Audit Logs", bootstyle="dark", command=self.load_audit, width=20).pack(side="left", padx=10)
         self.tr_audit = self.mk_tree(p, ["Audit ID","Operation","Time","User","Description"], "dark")
         self.load_audit()
 
-    def load_audit(self): self.run_query("SELECT * FROM Student_Audit_Log ORDER BY audit_timestamp DESC", self.tr_audit)
+    def load_audit(self):
+        try:
+            bounds = [datetime.date.fromisoformat(e.get().strip()) if e.get().strip() else None
+                      for e in (self.e_audit_from, self.e_audit_to)]
+        except ValueError:
+            return messagebox.showwarning("Audit Logs", "Dates must be written as YYYY-MM-DD (or left empty).")
+        self.load_table(self.tr_audit, "audit", queries.audit_range(*bounds))
+
+    def tail_audit(self):
+        # Incremental: only entries newer than the newest one shown are fetched and put on top
+        if not hasattr(self, 'tr_audit'): return   # tab not opened yet: it loads the latest entries when it is
+        pager = self.pagers.get(self.tr_audit)
+        if pager: pager.refresh_head()
+        else: self.load_audit()
+
+    def on_listener_event(self, channel, payload):
+        # Listener thread: evict first (the cache is thread-safe), then hand the event to Tk
+        table = parse_payload(payload).get("table") if channel else None
+        if not self.cache_notify: self.cache.invalidate({"student_audit_log"})   # the tail itself must not come from the cache
+        elif table: self.cache.invalidate(with_triggers({table}))
+        else: self.cache.invalidate()
+        self.runner.call_soon(self.on_notify, channel, payload)
+
+    def on_notify(self, channel, payload):
+        # Also called with channel None after the listener reconnects, so missed entries are caught up.
+        # Bursts of notifications (bulk writes) are coalesced into one tail query.
+        if self.audit_tail_after is None:
+            self.audit_tail_after = self.root.after(100, self._tail_from_notify)
+
+    def _tail_from_notify(self):
+        self.audit_tail_after = None
+        self.tail_audit()
+
+    # ==========================
+    #   PERFORMANCE
+    # ==========================
+    def build_perf_tab(self, p):
+        f = ttk.Frame(p); f.pack(fill="x", padx=10, pady=10)
+        ttk.Button(f, text="Refresh", bootstyle="info", command=self.load_perf, width=12).pack(side="left", padx=5)
+        ttk.Button(f, text="Reset", bootstyle="secondary", command=self.reset_perf, width=10).pack(side="left", padx=5)
+        self.lbl_perf = ttk.Label(f, text="", font=("Arial", 10)); self.lbl_perf.pack(side="left", padx=15)
+        # Timings of this app's own statements, grouped by fingerprint (literals replaced by ?)
+        buckets = "/".join(f"<{b}" for b in instrumentation.BUCKETS_MS) + "/more"
+        self.tr_perf = self.mk_tree(p, ["Query","Calls","Rows","Avg Exec ms","Max Exec ms","Fetch ms","Tk Insert ms","Histogram"], "info")
+        self.tr_perf.heading("Histogram", text=f"Exec ms ({buckets})")
+        self.tr_perf.column("Query", width=520, anchor="w")
+        self.tr_perf.column("Histogram", width=220)
+        # Server-wide figures, when the pg_stat_statements extension is installed
+        fs = ttk.Labelframe(p, text="pg_stat_statements", padding=5, bootstyle="secondary"); fs.pack(fill="both", expand=True, padx=10, pady=5)
+        self.lbl_pgss = ttk.Label(fs, text="", font=("Arial", 10, "italic")); self.lbl_pgss.pack(anchor="w", padx=10)
+        self.tr_pgss = self.mk_tree(fs, ["Query","Calls","Total ms","Mean ms","Rows"], "secondary")
+        self.tr_pgss.column("Query", width=700, anchor="w")
+        self.tree_tab[self.tr_pgss] = p
+        self.load_perf()
+
+    def load_perf(self):
+        self.tr_perf.delete(*self.tr_perf.get_children())
+        queries_seen = sorted(instrumentation.STATS.snapshot().items(), key=lambda kv: -(kv[1]["execute"] + kv[1]["fetch"]))
+        for fp, e in queries_seen:
+            n = max(1, e["calls"])
+            self.tr_perf.insert("", "end", values=(fp[:300], e["calls"], e["rows"], f"{e['execute'] / n * 1000:.1f}", f"{e['max'] * 1000:.1f}",
+                                                    f"{e['fetch'] * 1000:.1f}", f"{e['render'] * 1000:.1f}", "/".join(map(str, e["hist"]))))
+        def work(conn, job):
+            try:
+                top = instrumentation.pg_stat_statements(conn)
+            except psycopg2.Error as e:
+                conn.rollback()
+                top = str(e).strip()   # e.g. installed but not in shared_preload_libraries
+            return db_connection.get_pool().snapshot(), top
+        def done(res):
+            st, top = res
+            connect = st["connect_time"] / st["created"] * 1000 if st["created"] else 0
+            wait = st["checkout_time"] / st["checkouts"] * 1000 if st["checkouts"] else 0
+            self.lbl_perf.config(text=f"{len(queries_seen)} statements  |  Connections opened: {st['created']} (avg {connect:.0f} ms)  |  "
+                                      f"Checkouts: {st['checkouts']} (avg wait {wait:.1f} ms)")
+            self.tr_pgss.delete(*self.tr_pgss.get_children())
+            if top is None: self.lbl_pgss.config(text="The pg_stat_statements extension is not installed in this database.")
+            elif isinstance(top, str): self.lbl_pgss.config(text=f"pg_stat_statements is not available: {top}")
+            else:
+                self.lbl_pgss.config(text=f"Top {len(top[1])} statements of this database by total execution time")
+                for row in top[1]: self.tr_pgss.insert("", "end", values=row)
+        self.run_async(work, done, err_title="Read Error", tab=self.tab_perf)
+
+    def reset_perf(self):
+        instrumentation.STATS.reset()
+        self.load_perf()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     root = ttk.Window(themename="superhero") 
     app = UniversityApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    db_connection.close_pool()
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import re
+import sys
+import hashlib
+import argparse
+
+import psycopg2
+
+import db_connection
+
+# ====================================================================
+#   VERSIONED SCHEMA MIGRATIONS
+# ====================================================================
+# Files in migrations/ are named NNN_description.sql and applied in
+# order, each in its own transaction, after part1/part2 have been loaded.
+# Applied versions are recorded in schema_migrations; every file is also
+# written to be idempotent, so re-running one by hand does no harm.
+#
+#   python migrate.py            apply all pending migrations
+#   python migrate.py --status   list applied / pending migrations
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+FILE_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+def discover(directory=MIGRATIONS_DIR):
+    found = []
+    for name in sorted(os.listdir(directory)):
+        m = FILE_RE.match(name)
+        if m:
+            path = os.path.join(directory, name)
+            with open(path, encoding="utf-8") as f: body = f.read()
+            found.append((int(m.group(1)), m.group(2), body, hashlib.sha256(body.encode()).hexdigest()))
+    return sorted(found)
+
+
+def applied_versions(cur):
+    cur.execute("""CREATE TABLE IF NOT EXISTS schema_migrations (
+                       version INTEGER PRIMARY KEY,
+                       name VARCHAR(100) NOT NULL,
+                       checksum VARCHAR(64) NOT NULL,
+                       applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+    cur.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cur.fetchall())
+
+
+def migrate(conn, target=None, log=print):
+    cur = conn.cursor()
+    # Serialise concurrent runs (e.g. two clients starting an upgrade at once)
+    cur.execute("SELECT pg_advisory_lock(hashtext('schema_migrations'))")
+    try:
+        done = applied_versions(cur)
+        conn.commit()
+        ran = []
+        for version, name, body, checksum in discover():
+            if target is not None and version > target: break
+            if version in done:
+                if done[version] != checksum: log(f"warning: {version:03d}_{name} changed after it was applied")
+                continue
+            log(f"applying {version:03d}_{name} ...")
+            try:
+                cur.execute(body)
+                cur.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)", (version, name, checksum))
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+                raise
+            ran.append(version)
+        return ran
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(hashtext('schema_migrations'))")
+        conn.commit()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Apply the SQL migrations in migrations/ to the configured database.")
+    ap.add_argument("--status", action="store_true", help="list applied and pending migrations, change nothing")
+    ap.add_argument("--target", type=int, help="stop after this version")
+    args = ap.parse_args(argv)
+    try:
+        conn = psycopg2.connect(**db_connection.connect_params(db_connection.load_config()))
+    except psycopg2.Error as e:
+        print(f"Error connecting to DB: {e}", file=sys.stderr)
+        return 2
+    try:
+        if args.status:
+            done = applied_versions(conn.cursor()); conn.commit()
+            for version, name, _, _ in discover():
+                print(f"{version:03d}_{name}: {'applied' if version in done else 'pending'}")
+            return 0
+        ran = migrate(conn, args.target)
+        print(f"{len(ran)} migration(s) applied." if ran else "Database is up to date.")
+        return 0
+    except psycopg2.Error as e:
+        print(f"Migration failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+/*
+-----------------------------------------------------------------------
+   MIGRATION 001: SERVER-SIDE RESULTS PROCESSING (DELIBERATION)
+
+   Execute after 'part1_final_version.sql' and 'part2_final_version.sql'.
+   Safe to run more than once.
+-----------------------------------------------------------------------
+*/
+
+-- ====================================================================
+-- 1. TABLES
+-- ====================================================================
+
+-- 1.1 Weight of each mark_type in a course's final mark.
+--     Marks are first averaged per mark_type, then combined with these
+--     weights; a mark_type without a row here weighs 1.
+CREATE TABLE IF NOT EXISTS Mark_Component (
+    course_id INTEGER NOT NULL,
+    department_id INTEGER NOT NULL,
+    mark_type VARCHAR(50) NOT NULL,
+    weight NUMERIC(5,2) NOT NULL,
+    CONSTRAINT pk_mark_component PRIMARY KEY (course_id, department_id, mark_type),
+    CONSTRAINT ck_mark_component_weight CHECK (weight > 0),
+    CONSTRAINT fk_component_course FOREIGN KEY (course_id, department_id)
+        REFERENCES Course(course_id, department_id)
+        ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- 1.2 Last computed result of every (student, course, department)
+CREATE TABLE IF NOT EXISTS Result_Snapshot (
+    student_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    department_id INTEGER NOT NULL,
+    final_mark NUMERIC(5,2) NOT NULL,
+    failing_grade NUMERIC(4,2) NOT NULL,
+    status VARCHAR(4) NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT pk_result_snapshot PRIMARY KEY (student_id, course_id, department_id),
+    CONSTRAINT ck_result_status CHECK (status IN ('PASS', 'FAIL'))
+);
+
+-- 1.3 Keys whose result is out of date (filled by triggers, emptied by refresh_results)
+CREATE TABLE IF NOT EXISTS Result_Pending (
+    student_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    department_id INTEGER NOT NULL,
+    CONSTRAINT pk_result_pending PRIMARY KEY (student_id, course_id, department_id)
+);
+
+
+-- ====================================================================
+-- 2. CHANGE TRACKING TRIGGERS
+-- ====================================================================
+
+-- 2.1 Marks: statement-level triggers with transition tables, so a bulk
+--     import queues its keys in one set-based INSERT
+CREATE OR REPLACE FUNCTION queue_result_refresh() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO Result_Pending
+        SELECT DISTINCT student_id, course_id, department_id FROM old_marks
+        ON CONFLICT DO NOTHING;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO Result_Pending
+        SELECT DISTINCT student_id, course_id, department_id FROM new_marks
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_results_marks_insert ON Marks;
+CREATE TRIGGER trg_results_marks_insert
+AFTER INSERT ON Marks
+REFERENCING NEW TABLE AS new_marks
+FOR EACH STATEMENT EXECUTE FUNCTION queue_result_refresh();
+
+DROP TRIGGER IF EXISTS trg_results_marks_update ON Marks;
+CREATE TRIGGER trg_results_marks_update
+AFTER UPDATE ON Marks
+REFERENCING OLD TABLE AS old_marks NEW TABLE AS new_marks
+FOR EACH STATEMENT EXECUTE FUNCTION queue_result_refresh();
+
+DROP TRIGGER IF EXISTS trg_results_marks_delete ON Marks;
+CREATE TRIGGER trg_results_marks_delete
+AFTER DELETE ON Marks
+REFERENCING OLD TABLE AS old_marks
+FOR EACH STATEMENT EXECUTE FUNCTION queue_result_refresh();
+
+-- 2.2 A new pass mark or new weights invalidate every result of the course
+CREATE OR REPLACE FUNCTION queue_course_results_refresh() RETURNS TRIGGER AS $$
+DECLARE
+    v_course INTEGER;
+    v_dept INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        v_course := OLD.course_id; v_dept := OLD.department_id;
+    ELSE
+        v_course := NEW.course_id; v_dept := NEW.department_id;
+    END IF;
+    INSERT INTO Result_Pending
+    SELECT DISTINCT student_id, course_id, department_id
+    FROM Marks
+    WHERE course_id = v_course AND department_id = v_dept
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_results_failing_grade ON Course;
+CREATE TRIGGER trg_results_failing_grade
+AFTER UPDATE OF failing_grade ON Course
+FOR EACH ROW
+WHEN (OLD.failing_grade IS DISTINCT FROM NEW.failing_grade)
+EXECUTE FUNCTION queue_course_results_refresh();
+
+DROP TRIGGER IF EXISTS trg_results_components ON Mark_Component;
+CREATE TRIGGER trg_results_components
+AFTER INSERT OR UPDATE OR DELETE ON Mark_Component
+FOR EACH ROW EXECUTE FUNCTION queue_course_results_refresh();
+
+
+-- ====================================================================
+-- 3. DELIBERATION
+-- ====================================================================
+
+-- 3.1 Recomputes the snapshot: everything on the first run (or when
+--     p_full is true), otherwise only the keys queued in Result_Pending.
+--     Returns the number of results written.
+CREATE OR REPLACE FUNCTION refresh_results(p_full BOOLEAN DEFAULT FALSE) RETURNS INTEGER AS $$
+DECLARE
+    n INTEGER;
+BEGIN
+    IF p_full OR NOT EXISTS (SELECT 1 FROM Result_Snapshot) THEN
+        DELETE FROM Result_Pending;
+        DELETE FROM Result_Snapshot;
+        INSERT INTO Result_Snapshot (student_id, course_id, department_id, final_mark, failing_grade, status)
+        WITH per_type AS (
+            SELECT m.student_id, m.course_id, m.department_id, m.mark_type, AVG(m.mark_value) AS avg_mark
+            FROM Marks m
+            GROUP BY m.student_id, m.course_id, m.department_id, m.mark_type
+        ), weighted AS (
+            SELECT p.student_id, p.course_id, p.department_id,
+                   ROUND(SUM(p.avg_mark * COALESCE(w.weight, 1)) / SUM(COALESCE(w.weight, 1)), 2) AS final_mark
+            FROM per_type p
+            LEFT JOIN Mark_Component w
+                   ON w.course_id = p.course_id AND w.department_id = p.department_id AND w.mark_type = p.mark_type
+            GROUP BY p.student_id, p.course_id, p.department_id
+        )
+        SELECT r.student_id, r.course_id, r.department_id, r.final_mark, COALESCE(c.failing_grade, 10),
+               CASE WHEN r.final_mark >= COALESCE(c.failing_grade, 10) THEN 'PASS' ELSE 'FAIL' END
+        FROM weighted r
+        JOIN Course c ON c.course_id = r.course_id AND c.department_id = r.department_id;
+        GET DIAGNOSTICS n = ROW_COUNT;
+        RETURN n;
+    END IF;
+
+    WITH claimed AS (
+        DELETE FROM Result_Pending RETURNING student_id, course_id, department_id
+    ), per_type AS (
+        SELECT m.student_id, m.course_id, m.department_id, m.mark_type, AVG(m.mark_value) AS avg_mark
+        FROM Marks m
+        JOIN claimed k ON k.student_id = m.student_id AND k.course_id = m.course_id AND k.department_id = m.department_id
+        GROUP BY m.student_id, m.course_id, m.department_id, m.mark_type
+    ), weighted AS (
+        SELECT p.student_id, p.course_id, p.department_id,
+               ROUND(SUM(p.avg_mark * COALESCE(w.weight, 1)) / SUM(COALESCE(w.weight, 1)), 2) AS final_mark
+        FROM per_type p
+        LEFT JOIN Mark_Component w
+               ON w.course_id = p.course_id AND w.department_id = p.department_id AND w.mark_type = p.mark_type
+        GROUP BY p.student_id, p.course_id, p.department_id
+    ), computed AS (
+        SELECT r.student_id, r.course_id, r.department_id, r.final_mark, COALESCE(c.failing_grade, 10) AS failing_grade,
+               CASE WHEN r.final_mark >= COALESCE(c.failing_grade, 10) THEN 'PASS' ELSE 'FAIL' END AS status
+        FROM weighted r
+        JOIN Course c ON c.course_id = r.course_id AND c.department_id = r.department_id
+    ), removed AS (
+        -- Keys whose last mark was deleted
+        DELETE FROM Result_Snapshot s
+        USING claimed k
+        WHERE s.student_id = k.student_id AND s.course_id = k.course_id AND s.department_id = k.department_id
+          AND NOT EXISTS (SELECT 1 FROM computed c
+                          WHERE c.student_id = k.student_id AND c.course_id = k.course_id AND c.department_id = k.department_id)
+    ), written AS (
+        INSERT INTO Result_Snapshot (student_id, course_id, department_id, final_mark, failing_grade, status)
+        SELECT * FROM computed
+        ON CONFLICT (student_id, course_id, department_id) DO UPDATE
+        SET final_mark = EXCLUDED.final_mark, failing_grade = EXCLUDED.failing_grade,
+            status = EXCLUDED.status, computed_at = CURRENT_TIMESTAMP
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO n FROM written;
+    RETURN n;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,73 @@
+/*
+-----------------------------------------------------------------------
+   MIGRATION 002: INDEX PACK FOR THE HOT LOOKUP PATHS
+
+   Apart from primary keys the schema had no indexes, so every report
+   and lookup was a full scan. Verify with: python check_indexes.py
+   Safe to run more than once.
+-----------------------------------------------------------------------
+*/
+
+-- ====================================================================
+-- 1. REPORT FUNCTIONS
+-- ====================================================================
+
+-- (a) get_students_by_group / (b) get_students_by_section
+-- Covering indexes: the functions read nothing else, so these are index-only scans.
+CREATE INDEX IF NOT EXISTS idx_student_group
+    ON Student (academic_group) INCLUDE (student_id, first_name, last_name, section);
+CREATE INDEX IF NOT EXISTS idx_student_section
+    ON Student (section) INCLUDE (student_id, first_name, last_name, academic_group);
+
+-- (h) get_failing_students / (i) get_resit_students
+-- Partial index: only failing marks are indexed, so it stays small however many marks pass.
+CREATE INDEX IF NOT EXISTS idx_marks_failing
+    ON Marks (mark_value) INCLUDE (student_id, course_id)
+    WHERE mark_value < 10;
+
+-- (j) get_excluded_students
+-- Partial index over the absences/lates only, ordered for the GROUP BY.
+CREATE INDEX IF NOT EXISTS idx_attendance_absences
+    ON Attendance (student_id, course_id)
+    WHERE status IN ('Absent', 'Late');
+
+
+-- ====================================================================
+-- 2. RESERVATIONS & AUDIT
+-- ====================================================================
+
+-- check_reservation_conflict: room + day lookup, times read from the index
+CREATE INDEX IF NOT EXISTS idx_reservation_room_date
+    ON Reservation (building, roomno, reserv_date) INCLUDE (start_time, end_time, reservation_id);
+
+-- Audit Logs tab: newest entries first
+CREATE INDEX IF NOT EXISTS idx_audit_timestamp
+    ON Student_Audit_Log (audit_timestamp DESC);
+
+
+-- ====================================================================
+-- 3. FOREIGN KEYS & JOINS
+-- ====================================================================
+-- PostgreSQL does not index the referencing side of a foreign key.
+-- Without these, deleting a Student/Course scans Marks/Enrollment/
+-- Attendance, and refresh_results() cannot find a key's marks quickly.
+
+CREATE INDEX IF NOT EXISTS idx_marks_student_course
+    ON Marks (student_id, course_id, department_id);
+CREATE INDEX IF NOT EXISTS idx_marks_course
+    ON Marks (course_id, department_id);
+CREATE INDEX IF NOT EXISTS idx_enrollment_course
+    ON Enrollment (course_id, department_id);
+CREATE INDEX IF NOT EXISTS idx_attendance_student_course
+    ON Attendance (student_id, course_id, attendance_date);
+CREATE INDEX IF NOT EXISTS idx_reservation_instructor
+    ON Reservation (instructor_id);
+CREATE INDEX IF NOT EXISTS idx_reservation_course
+    ON Reservation (course_id, department_id);
+
+ANALYZE Student;
+ANALYZE Marks;
+ANALYZE Attendance;
+ANALYZE Reservation;
+ANALYZE Enrollment;
+ANALYZE Student_Audit_Log;
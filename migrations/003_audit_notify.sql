@@ -0,0 +1,48 @@
+/*
+-----------------------------------------------------------------------
+   MIGRATION 003: PUSH NEW AUDIT ENTRIES TO CLIENTS (LISTEN/NOTIFY)
+
+   Both audit trigger functions now announce every row they write on
+   the 'student_audit' channel, with a JSON payload such as
+   {"audit_id": 42, "table": "marks"}. Notifications are delivered when
+   the writing transaction commits, so clients never see rolled-back rows.
+   Safe to run more than once.
+-----------------------------------------------------------------------
+*/
+
+-- Student table (statement trigger from part 1)
+CREATE OR REPLACE FUNCTION log_student_changes() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    v_audit_id INTEGER;
+BEGIN
+    INSERT INTO Student_Audit_Log (operation_type, description)
+    VALUES (
+        TG_OP,
+        'Operation ' || TG_OP || ' executed on Student table by ' || SESSION_USER || ' at ' || NOW()
+    )
+    RETURNING audit_id INTO v_audit_id;
+    PERFORM pg_notify('student_audit', json_build_object('audit_id', v_audit_id, 'table', TG_TABLE_NAME)::text);
+    RETURN NULL; -- Required for AFTER triggers
+END;
+$$;
+
+-- Marks & Attendance (statement triggers from part 2)
+CREATE OR REPLACE FUNCTION audit_marks_attendance() RETURNS TRIGGER AS $$
+DECLARE
+    v_audit_id INTEGER;
+BEGIN
+    INSERT INTO Student_Audit_Log (operation_type, table_name, changed_by, audit_timestamp, description)
+    VALUES (
+        TG_OP,
+        TG_TABLE_NAME,
+        SESSION_USER,
+        NOW(),
+        'User ' || SESSION_USER || ' performed ' || TG_OP || ' on table ' || TG_TABLE_NAME
+    )
+    RETURNING audit_id INTO v_audit_id;
+    PERFORM pg_notify('student_audit', json_build_object('audit_id', v_audit_id, 'table', TG_TABLE_NAME)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
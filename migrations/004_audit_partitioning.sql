@@ -0,0 +1,106 @@
+/*
+-----------------------------------------------------------------------
+   MIGRATION 004: MONTHLY PARTITIONS FOR STUDENT_AUDIT_LOG
+
+   Student_Audit_Log becomes a table range-partitioned by month on
+   audit_timestamp (partitions named student_audit_log_yYYYYmMM), with a
+   DEFAULT partition as a safety net and a BRIN index on the timestamp.
+   Old months are detached and archived by audit_retention.py, which also
+   keeps creating partitions ahead of time (ensure_audit_partitions).
+   Safe to run more than once.
+-----------------------------------------------------------------------
+*/
+
+-- ====================================================================
+-- 1. PARTITION MAINTENANCE
+-- ====================================================================
+
+-- Creates the monthly partitions from the month of p_from up to
+-- p_months_ahead months after the current one. Rows that already landed
+-- in the default partition for such a month are moved into it.
+-- Returns the number of partitions created.
+CREATE OR REPLACE FUNCTION ensure_audit_partitions(p_from DATE DEFAULT CURRENT_DATE, p_months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    v_month DATE := date_trunc('month', p_from)::DATE;
+    v_last DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => p_months_ahead))::DATE;
+    v_next DATE;
+    v_name TEXT;
+    n INTEGER := 0;
+BEGIN
+    WHILE v_month <= v_last LOOP
+        v_next := (v_month + INTERVAL '1 month')::DATE;
+        v_name := 'student_audit_log_' || to_char(v_month, '"y"YYYY"m"MM');
+        IF to_regclass(v_name) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM student_audit_log_default
+                       WHERE audit_timestamp >= v_month AND audit_timestamp < v_next) THEN
+                EXECUTE format('CREATE TABLE %I (LIKE Student_Audit_Log INCLUDING DEFAULTS)', v_name);
+                EXECUTE format('WITH moved AS (DELETE FROM student_audit_log_default
+                                               WHERE audit_timestamp >= %L AND audit_timestamp < %L RETURNING *)
+                                INSERT INTO %I SELECT * FROM moved', v_month, v_next, v_name);
+                EXECUTE format('ALTER TABLE Student_Audit_Log ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               v_name, v_month, v_next);
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF Student_Audit_Log FOR VALUES FROM (%L) TO (%L)',
+                               v_name, v_month, v_next);
+            END IF;
+            n := n + 1;
+        END IF;
+        v_month := v_next;
+    END LOOP;
+    RETURN n;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- ====================================================================
+-- 2. CONVERSION (only while the log is still a plain table)
+-- ====================================================================
+DO $$
+DECLARE
+    v_first TIMESTAMP;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'student_audit_log'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    -- Keep the old heap (and its sequence) aside while the new table is built
+    ALTER TABLE Student_Audit_Log RENAME TO student_audit_log_old;
+    ALTER TABLE student_audit_log_old RENAME CONSTRAINT pk_student_audit_log TO pk_student_audit_log_old;
+    ALTER INDEX IF EXISTS idx_audit_timestamp RENAME TO idx_audit_timestamp_old;
+    ALTER SEQUENCE student_audit_log_audit_id_seq OWNED BY NONE;
+
+    -- The partition key must be part of the primary key
+    CREATE TABLE Student_Audit_Log (
+        audit_id INTEGER NOT NULL DEFAULT nextval('student_audit_log_audit_id_seq'),
+        operation_type VARCHAR(10) NOT NULL,
+        audit_timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        changed_by VARCHAR(50) DEFAULT SESSION_USER,
+        description TEXT,
+        table_name VARCHAR(50),
+        CONSTRAINT pk_student_audit_log PRIMARY KEY (audit_id, audit_timestamp)
+    ) PARTITION BY RANGE (audit_timestamp);
+    ALTER SEQUENCE student_audit_log_audit_id_seq OWNED BY Student_Audit_Log.audit_id;
+
+    CREATE TABLE student_audit_log_default PARTITION OF Student_Audit_Log DEFAULT;
+
+    SELECT MIN(audit_timestamp) INTO v_first FROM student_audit_log_old;
+    PERFORM ensure_audit_partitions(COALESCE(v_first, CURRENT_TIMESTAMP)::DATE, 3);
+
+    INSERT INTO Student_Audit_Log (audit_id, operation_type, audit_timestamp, changed_by, description, table_name)
+    SELECT audit_id, operation_type, COALESCE(audit_timestamp, CURRENT_TIMESTAMP), changed_by, description, table_name
+    FROM student_audit_log_old;
+
+    DROP TABLE student_audit_log_old;
+END $$;
+
+
+-- ====================================================================
+-- 3. INDEXES
+-- ====================================================================
+-- Audit rows arrive in timestamp order, so a BRIN index stays tiny and
+-- narrows a date range to a few block ranges of each partition.
+CREATE INDEX IF NOT EXISTS idx_audit_timestamp_brin
+    ON Student_Audit_Log USING BRIN (audit_timestamp);
+
+ANALYZE Student_Audit_Log;
@@ -0,0 +1,132 @@
+/*
+-----------------------------------------------------------------------
+   MIGRATION 005: OVERLAP-FREE RESERVATIONS AND FREE-ROOM SEARCH
+
+   A room can no longer be booked twice for overlapping times: the rule
+   is enforced by a GiST exclusion constraint on (building, roomno,
+   time range), so a conflicting INSERT/UPDATE fails atomically with
+   SQLSTATE 23P01 (exclusion_violation). The constraint needs the
+   btree_gist extension; on servers without it a trigger enforces the
+   same rule (serialised per room) and raises the same error.
+
+   Also adds a sequence default for reservation_id, find_free_rooms()
+   and an index-friendly check_reservation_conflict().
+   Safe to run more than once.
+-----------------------------------------------------------------------
+*/
+
+-- ====================================================================
+-- 1. EXISTING DATA MUST BE CONFLICT-FREE
+-- ====================================================================
+DO $$
+DECLARE
+    v_clashes TEXT;
+BEGIN
+    SELECT string_agg(format('#%s/#%s', a.reservation_id, b.reservation_id), ', ')
+    INTO v_clashes
+    FROM Reservation a
+    JOIN Reservation b
+      ON a.building = b.building AND a.roomno = b.roomno AND a.reserv_date = b.reserv_date
+     AND a.reservation_id < b.reservation_id
+     AND a.start_time < b.end_time AND b.start_time < a.end_time;
+    IF v_clashes IS NOT NULL THEN
+        RAISE EXCEPTION 'Overlapping reservations must be fixed before migration 005: %', v_clashes;
+    END IF;
+END $$;
+
+
+-- ====================================================================
+-- 2. NEW RESERVATION IDS FROM A SEQUENCE
+-- ====================================================================
+CREATE SEQUENCE IF NOT EXISTS reservation_reservation_id_seq OWNED BY Reservation.reservation_id;
+SELECT setval('reservation_reservation_id_seq', GREATEST(COALESCE(MAX(reservation_id), 0), 1), MAX(reservation_id) IS NOT NULL)
+FROM Reservation;
+ALTER TABLE Reservation ALTER COLUMN reservation_id SET DEFAULT nextval('reservation_reservation_id_seq');
+
+
+-- ====================================================================
+-- 3. NO OVERLAPPING BOOKINGS OF A ROOM
+-- ====================================================================
+-- Time ranges are half-open, so back-to-back bookings (10:00-11:30 then
+-- 11:30-13:00) are allowed, as with OVERLAPS.
+CREATE OR REPLACE FUNCTION reservation_no_overlap() RETURNS TRIGGER AS $$
+DECLARE
+    v_other INTEGER;
+BEGIN
+    -- One booking at a time per room, so two concurrent inserts cannot both pass the check
+    PERFORM pg_advisory_xact_lock(hashtext('reservation:' || NEW.building || ':' || NEW.roomno));
+    SELECT reservation_id INTO v_other
+    FROM Reservation R
+    WHERE R.building = NEW.building AND R.roomno = NEW.roomno AND R.reserv_date = NEW.reserv_date
+      AND R.reservation_id <> NEW.reservation_id
+      AND R.start_time < NEW.end_time AND NEW.start_time < R.end_time
+    LIMIT 1;
+    IF v_other IS NOT NULL THEN
+        RAISE EXCEPTION 'conflicting key value violates exclusion constraint "ex_reservation_room_time"'
+            USING ERRCODE = 'exclusion_violation',
+                  DETAIL = format('Room %s-%s is already booked on %s by reservation %s.', NEW.building, NEW.roomno, NEW.reserv_date, v_other);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    BEGIN
+        CREATE EXTENSION IF NOT EXISTS btree_gist;
+    EXCEPTION WHEN OTHERS THEN
+        RAISE NOTICE 'btree_gist is not available (%); reservation overlaps are checked by a trigger instead', SQLERRM;
+    END;
+
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'btree_gist') THEN
+        DROP TRIGGER IF EXISTS trg_reservation_no_overlap ON Reservation;
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'ex_reservation_room_time') THEN
+            ALTER TABLE Reservation ADD CONSTRAINT ex_reservation_room_time
+                EXCLUDE USING gist (
+                    building WITH =,
+                    roomno WITH =,
+                    tsrange(reserv_date + start_time, reserv_date + end_time) WITH &&
+                );
+        END IF;
+    ELSIF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_reservation_no_overlap') THEN
+        CREATE TRIGGER trg_reservation_no_overlap
+            BEFORE INSERT OR UPDATE OF building, roomno, reserv_date, start_time, end_time ON Reservation
+            FOR EACH ROW EXECUTE FUNCTION reservation_no_overlap();
+    END IF;
+END $$;
+
+
+-- ====================================================================
+-- 4. CONFLICT CHECK AND FREE-ROOM SEARCH
+-- ====================================================================
+-- Same contract as in part 1 (ID of a conflicting reservation, or 0),
+-- written with the constraint's range expression so its index is used.
+CREATE OR REPLACE FUNCTION check_reservation_conflict(p_building text, p_roomno text, p_res_date date, p_start_time time without time zone, p_end_time time without time zone) RETURNS integer
+    LANGUAGE sql STABLE
+    AS $$
+    SELECT COALESCE((
+        SELECT reservation_id
+        FROM Reservation R
+        WHERE R.building = p_building
+          AND R.roomno = p_roomno
+          AND R.reserv_date = p_res_date
+          AND tsrange(R.reserv_date + R.start_time, R.reserv_date + R.end_time)
+              && tsrange(p_res_date + p_start_time, p_res_date + p_end_time)
+        LIMIT 1), 0);
+$$;
+
+-- Rooms with at least p_min_capacity seats and no booking overlapping the window
+CREATE OR REPLACE FUNCTION find_free_rooms(p_date DATE, p_start TIME, p_end TIME, p_min_capacity INTEGER DEFAULT 0)
+RETURNS TABLE (building VARCHAR, roomno VARCHAR, capacity INTEGER)
+    LANGUAGE sql STABLE
+    AS $$
+    SELECT r.building, r.roomno, r.capacity
+    FROM Room r
+    WHERE COALESCE(r.capacity, 0) >= p_min_capacity
+      AND NOT EXISTS (
+          SELECT 1 FROM Reservation R2
+          WHERE R2.building = r.building AND R2.roomno = r.roomno AND R2.reserv_date = p_date
+            AND tsrange(R2.reserv_date + R2.start_time, R2.reserv_date + R2.end_time)
+                && tsrange(p_date + p_start, p_date + p_end))
+    ORDER BY r.capacity, r.building, r.roomno;
+$$;
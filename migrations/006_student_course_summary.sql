@@ -0,0 +1,409 @@
+/*
+-----------------------------------------------------------------------
+   MIGRATION 006: TRIGGER-MAINTAINED STUDENT / COURSE SUMMARY
+
+   get_failing_students(), get_resit_students() and
+   get_excluded_students() used to aggregate the raw Marks and
+   Attendance tables on every call. They now read
+   Student_Course_Summary: one row per (student, course, department)
+   holding the mark count / sum / average, the latest mark, the pass
+   status and the absence / late counts. Row triggers on Marks and
+   Attendance keep it up to date one change at a time.
+
+   Attendance has no department_id: a row counts towards the student's
+   enrollment in that course (or, without one, the course's first
+   department), as decided by attendance_department(). Triggers on
+   Enrollment and Course recount a student's absences whenever that
+   answer can change, so they are always found under it.
+
+   The reports no longer read Marks / Attendance, so the partial
+   indexes 002 added for them are dropped.
+
+   rebuild_student_course_summary() recomputes the table from the raw
+   tables; check_student_course_summary() lists the rows that differ.
+   Safe to run more than once.
+-----------------------------------------------------------------------
+*/
+
+-- ====================================================================
+-- 1. TABLE
+-- ====================================================================
+CREATE TABLE IF NOT EXISTS Student_Course_Summary (
+    student_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    department_id INTEGER NOT NULL,
+    mark_count INTEGER NOT NULL DEFAULT 0,
+    mark_sum NUMERIC NOT NULL DEFAULT 0,
+    latest_mark_id INTEGER,
+    latest_mark NUMERIC(5,2),
+    absent_count INTEGER NOT NULL DEFAULT 0,
+    late_count INTEGER NOT NULL DEFAULT 0,
+    failing_grade NUMERIC(4,2) NOT NULL DEFAULT 10,
+    avg_mark NUMERIC(5,2) GENERATED ALWAYS AS (
+        CASE WHEN mark_count > 0 THEN ROUND(mark_sum / mark_count, 2) END) STORED,
+    status VARCHAR(4) GENERATED ALWAYS AS (
+        CASE WHEN mark_count > 0 THEN
+            CASE WHEN ROUND(mark_sum / mark_count, 2) >= failing_grade THEN 'PASS' ELSE 'FAIL' END
+        END) STORED,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT pk_student_course_summary PRIMARY KEY (student_id, course_id, department_id)
+);
+
+-- Reports: failing / resit candidates and excluded students, per department
+CREATE INDEX IF NOT EXISTS idx_summary_failing
+    ON Student_Course_Summary (department_id, course_id, student_id) INCLUDE (avg_mark)
+    WHERE status = 'FAIL';
+CREATE INDEX IF NOT EXISTS idx_summary_excluded
+    ON Student_Course_Summary (department_id, course_id, student_id) INCLUDE (absent_count, late_count)
+    WHERE absent_count + late_count >= 3;
+
+-- Only the old aggregating reports used these; they would still be maintained on every write
+DROP INDEX IF EXISTS idx_marks_failing;
+DROP INDEX IF EXISTS idx_attendance_absences;
+
+
+-- ====================================================================
+-- 2. EXPECTED CONTENT (used by the rebuild and the consistency check)
+-- ====================================================================
+CREATE OR REPLACE FUNCTION attendance_department(p_student INTEGER, p_course INTEGER) RETURNS INTEGER
+    LANGUAGE sql STABLE
+    AS $$
+    SELECT COALESCE(
+        (SELECT department_id FROM Enrollment WHERE student_id = p_student AND course_id = p_course
+         ORDER BY department_id LIMIT 1),
+        (SELECT department_id FROM Course WHERE course_id = p_course ORDER BY department_id LIMIT 1));
+$$;
+
+CREATE OR REPLACE VIEW Student_Course_Summary_Expected AS
+WITH marks AS (
+    SELECT student_id, course_id, department_id, COUNT(*) AS mark_count, SUM(mark_value) AS mark_sum,
+           (ARRAY_AGG(mark_id ORDER BY mark_id DESC))[1] AS latest_mark_id,
+           (ARRAY_AGG(mark_value ORDER BY mark_id DESC))[1] AS latest_mark
+    FROM Marks
+    GROUP BY student_id, course_id, department_id
+), absences AS (
+    SELECT student_id, course_id, attendance_department(student_id, course_id) AS department_id, absent_count, late_count
+    FROM (SELECT student_id, course_id,
+                 COUNT(*) FILTER (WHERE status = 'Absent') AS absent_count,
+                 COUNT(*) FILTER (WHERE status = 'Late') AS late_count
+          FROM Attendance
+          WHERE status IN ('Absent', 'Late')
+          GROUP BY student_id, course_id) a
+)
+SELECT student_id, course_id, department_id,
+       COALESCE(m.mark_count, 0)::INTEGER AS mark_count, COALESCE(m.mark_sum, 0) AS mark_sum,
+       m.latest_mark_id, m.latest_mark,
+       COALESCE(a.absent_count, 0)::INTEGER AS absent_count, COALESCE(a.late_count, 0)::INTEGER AS late_count,
+       COALESCE(c.failing_grade, 10) AS failing_grade
+FROM marks m
+FULL JOIN (SELECT * FROM absences WHERE department_id IS NOT NULL) a USING (student_id, course_id, department_id)
+LEFT JOIN Course c USING (course_id, department_id);
+
+
+-- ====================================================================
+-- 3. INCREMENTAL MAINTENANCE
+-- ====================================================================
+
+-- 3.1 One mark added to / removed from its key
+CREATE OR REPLACE FUNCTION summary_add_mark(p_student INTEGER, p_course INTEGER, p_dept INTEGER, p_mark_id INTEGER, p_value NUMERIC)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO Student_Course_Summary AS s
+        (student_id, course_id, department_id, mark_count, mark_sum, latest_mark_id, latest_mark, failing_grade)
+    SELECT p_student, p_course, p_dept, 1, p_value, p_mark_id, p_value,
+           COALESCE((SELECT failing_grade FROM Course WHERE course_id = p_course AND department_id = p_dept), 10)
+    ON CONFLICT (student_id, course_id, department_id) DO UPDATE
+    SET mark_count = s.mark_count + 1,
+        mark_sum = s.mark_sum + p_value,
+        latest_mark_id = CASE WHEN s.latest_mark_id IS NULL OR p_mark_id > s.latest_mark_id THEN p_mark_id ELSE s.latest_mark_id END,
+        latest_mark = CASE WHEN s.latest_mark_id IS NULL OR p_mark_id > s.latest_mark_id THEN p_value ELSE s.latest_mark END,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION summary_remove_mark(p_student INTEGER, p_course INTEGER, p_dept INTEGER, p_mark_id INTEGER, p_value NUMERIC)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE Student_Course_Summary s
+    SET mark_count = s.mark_count - 1,
+        mark_sum = s.mark_sum - p_value,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE s.student_id = p_student AND s.course_id = p_course AND s.department_id = p_dept;
+    -- The removed mark may have been the latest one: take the newest remaining mark instead
+    UPDATE Student_Course_Summary s
+    SET (latest_mark_id, latest_mark) = (
+        SELECT m.mark_id, m.mark_value FROM Marks m
+        WHERE m.student_id = p_student AND m.course_id = p_course AND m.department_id = p_dept
+        ORDER BY m.mark_id DESC LIMIT 1)
+    WHERE s.student_id = p_student AND s.course_id = p_course AND s.department_id = p_dept
+      AND s.latest_mark_id = p_mark_id;
+    DELETE FROM Student_Course_Summary s
+    WHERE s.student_id = p_student AND s.course_id = p_course AND s.department_id = p_dept
+      AND s.mark_count = 0 AND s.absent_count = 0 AND s.late_count = 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 3.2 One absence / late arrival added (p_sign = 1) or removed (p_sign = -1)
+CREATE OR REPLACE FUNCTION summary_count_attendance(p_student INTEGER, p_course INTEGER, p_status VARCHAR, p_sign INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    v_dept INTEGER;
+    v_absent INTEGER := CASE WHEN p_status = 'Absent' THEN p_sign ELSE 0 END;
+    v_late INTEGER := CASE WHEN p_status = 'Late' THEN p_sign ELSE 0 END;
+BEGIN
+    IF v_absent = 0 AND v_late = 0 THEN RETURN; END IF;
+    v_dept := attendance_department(p_student, p_course);
+    IF v_dept IS NULL THEN RETURN; END IF;
+    IF p_sign > 0 THEN
+        INSERT INTO Student_Course_Summary AS s (student_id, course_id, department_id, absent_count, late_count, failing_grade)
+        SELECT p_student, p_course, v_dept, v_absent, v_late,
+               COALESCE((SELECT failing_grade FROM Course WHERE course_id = p_course AND department_id = v_dept), 10)
+        ON CONFLICT (student_id, course_id, department_id) DO UPDATE
+        SET absent_count = s.absent_count + v_absent,
+            late_count = s.late_count + v_late,
+            updated_at = CURRENT_TIMESTAMP;
+    ELSE
+        UPDATE Student_Course_Summary s
+        SET absent_count = s.absent_count + v_absent,
+            late_count = s.late_count + v_late,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE s.student_id = p_student AND s.course_id = p_course AND s.department_id = v_dept;
+        DELETE FROM Student_Course_Summary s
+        WHERE s.student_id = p_student AND s.course_id = p_course AND s.department_id = v_dept
+          AND s.mark_count = 0 AND s.absent_count = 0 AND s.late_count = 0;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 3.3 Row triggers (an UPDATE is the removal of the old row plus the addition of the new one)
+CREATE OR REPLACE FUNCTION summary_marks_change() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM summary_remove_mark(OLD.student_id, OLD.course_id, OLD.department_id, OLD.mark_id, OLD.mark_value);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM summary_add_mark(NEW.student_id, NEW.course_id, NEW.department_id, NEW.mark_id, NEW.mark_value);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_summary_marks ON Marks;
+CREATE TRIGGER trg_summary_marks
+AFTER INSERT OR DELETE OR UPDATE OF mark_id, student_id, course_id, department_id, mark_value ON Marks
+FOR EACH ROW EXECUTE FUNCTION summary_marks_change();
+
+CREATE OR REPLACE FUNCTION summary_attendance_change() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM summary_count_attendance(OLD.student_id, OLD.course_id, OLD.status, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM summary_count_attendance(NEW.student_id, NEW.course_id, NEW.status, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_summary_attendance ON Attendance;
+CREATE TRIGGER trg_summary_attendance
+AFTER INSERT OR DELETE OR UPDATE OF student_id, course_id, status ON Attendance
+FOR EACH ROW EXECUTE FUNCTION summary_attendance_change();
+
+-- 3.4 Enrollment / Course changes can move a student's absences to another department.
+-- They are recounted from Attendance under the current attendance_department(), which is where
+-- summary_count_attendance() will look when one of them is later updated or deleted.
+CREATE OR REPLACE FUNCTION summary_place_attendance(p_student INTEGER, p_course INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    v_dept INTEGER := attendance_department(p_student, p_course);
+BEGIN
+    UPDATE Student_Course_Summary s
+    SET absent_count = 0, late_count = 0, updated_at = CURRENT_TIMESTAMP
+    WHERE s.student_id = p_student AND s.course_id = p_course
+      AND (s.absent_count <> 0 OR s.late_count <> 0);
+    IF v_dept IS NOT NULL THEN
+        INSERT INTO Student_Course_Summary AS s (student_id, course_id, department_id, absent_count, late_count, failing_grade)
+        SELECT p_student, p_course, v_dept, a.absent_count, a.late_count,
+               COALESCE((SELECT failing_grade FROM Course WHERE course_id = p_course AND department_id = v_dept), 10)
+        FROM (SELECT COUNT(*) FILTER (WHERE status = 'Absent')::INTEGER AS absent_count,
+                     COUNT(*) FILTER (WHERE status = 'Late')::INTEGER AS late_count
+              FROM Attendance
+              WHERE student_id = p_student AND course_id = p_course AND status IN ('Absent', 'Late')) a
+        WHERE a.absent_count + a.late_count > 0
+        ON CONFLICT (student_id, course_id, department_id) DO UPDATE
+        SET absent_count = EXCLUDED.absent_count,
+            late_count = EXCLUDED.late_count,
+            updated_at = CURRENT_TIMESTAMP;
+    END IF;
+    DELETE FROM Student_Course_Summary s
+    WHERE s.student_id = p_student AND s.course_id = p_course
+      AND s.mark_count = 0 AND s.absent_count = 0 AND s.late_count = 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION summary_enrollment_change() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM summary_place_attendance(OLD.student_id, OLD.course_id);
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND (NEW.student_id, NEW.course_id) IS DISTINCT FROM (OLD.student_id, OLD.course_id)) THEN
+        PERFORM summary_place_attendance(NEW.student_id, NEW.course_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_summary_enrollment ON Enrollment;
+CREATE TRIGGER trg_summary_enrollment
+AFTER INSERT OR DELETE OR UPDATE OF student_id, course_id, department_id ON Enrollment
+FOR EACH ROW EXECUTE FUNCTION summary_enrollment_change();
+
+-- A course added to / removed from a department changes the fallback of students not enrolled in it
+CREATE OR REPLACE FUNCTION summary_course_change() RETURNS TRIGGER AS $$
+DECLARE
+    v_course INTEGER;
+BEGIN
+    FOR v_course IN
+        SELECT DISTINCT c FROM (VALUES (CASE WHEN TG_OP <> 'INSERT' THEN OLD.course_id END),
+                                       (CASE WHEN TG_OP <> 'DELETE' THEN NEW.course_id END)) v(c)
+        WHERE c IS NOT NULL
+    LOOP
+        PERFORM summary_place_attendance(a.student_id, v_course)
+        FROM (SELECT DISTINCT student_id FROM Attendance
+              WHERE course_id = v_course AND status IN ('Absent', 'Late')) a;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_summary_course ON Course;
+CREATE TRIGGER trg_summary_course
+AFTER INSERT OR DELETE OR UPDATE OF course_id, department_id ON Course
+FOR EACH ROW EXECUTE FUNCTION summary_course_change();
+
+-- 3.5 A new pass mark changes the status of every summary row of the course
+CREATE OR REPLACE FUNCTION summary_failing_grade_change() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE Student_Course_Summary
+    SET failing_grade = COALESCE(NEW.failing_grade, 10), updated_at = CURRENT_TIMESTAMP
+    WHERE course_id = NEW.course_id AND department_id = NEW.department_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_summary_failing_grade ON Course;
+CREATE TRIGGER trg_summary_failing_grade
+AFTER UPDATE OF failing_grade ON Course
+FOR EACH ROW
+WHEN (OLD.failing_grade IS DISTINCT FROM NEW.failing_grade)
+EXECUTE FUNCTION summary_failing_grade_change();
+
+
+-- ====================================================================
+-- 4. REBUILD AND CONSISTENCY CHECK
+-- ====================================================================
+
+-- 4.1 Recomputes the whole table; returns the number of rows written
+CREATE OR REPLACE FUNCTION rebuild_student_course_summary() RETURNS INTEGER AS $$
+DECLARE
+    n INTEGER;
+BEGIN
+    -- Writers wait until the rebuild commits, so no change slips in between
+    LOCK TABLE Marks, Attendance, Enrollment, Course IN SHARE MODE;
+    DELETE FROM Student_Course_Summary;
+    INSERT INTO Student_Course_Summary
+        (student_id, course_id, department_id, mark_count, mark_sum, latest_mark_id, latest_mark, absent_count, late_count, failing_grade)
+    SELECT student_id, course_id, department_id, mark_count, mark_sum, latest_mark_id, latest_mark, absent_count, late_count, failing_grade
+    FROM Student_Course_Summary_Expected;
+    GET DIAGNOSTICS n = ROW_COUNT;
+    RETURN n;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 4.2 Rows that are missing, unexpected or different from what the raw tables give
+CREATE OR REPLACE FUNCTION check_student_course_summary()
+RETURNS TABLE (student_id INTEGER, course_id INTEGER, department_id INTEGER, problem TEXT)
+    LANGUAGE sql STABLE
+    AS $$
+    SELECT COALESCE(s.student_id, e.student_id), COALESCE(s.course_id, e.course_id), COALESCE(s.department_id, e.department_id),
+           CASE
+               WHEN s.student_id IS NULL THEN 'missing'
+               WHEN e.student_id IS NULL THEN concat_ws(': ', 'unexpected', misplaced.problem)
+               ELSE concat_ws(', ',
+                   CASE WHEN s.mark_count <> e.mark_count THEN format('mark_count %s, expected %s', s.mark_count, e.mark_count) END,
+                   CASE WHEN s.mark_sum <> e.mark_sum THEN format('mark_sum %s, expected %s', s.mark_sum, e.mark_sum) END,
+                   CASE WHEN s.latest_mark_id IS DISTINCT FROM e.latest_mark_id OR s.latest_mark IS DISTINCT FROM e.latest_mark
+                        THEN format('latest mark #%s = %s, expected #%s = %s', s.latest_mark_id, s.latest_mark, e.latest_mark_id, e.latest_mark) END,
+                   CASE WHEN s.absent_count <> e.absent_count THEN format('absent_count %s, expected %s', s.absent_count, e.absent_count) END,
+                   CASE WHEN s.late_count <> e.late_count THEN format('late_count %s, expected %s', s.late_count, e.late_count) END,
+                   CASE WHEN s.failing_grade <> e.failing_grade THEN format('failing_grade %s, expected %s', s.failing_grade, e.failing_grade) END,
+                   misplaced.problem)
+           END
+    FROM Student_Course_Summary s
+    FULL JOIN Student_Course_Summary_Expected e
+           ON e.student_id = s.student_id AND e.course_id = s.course_id AND e.department_id = s.department_id
+    -- Absences left under a department the student's enrollment no longer points to
+    LEFT JOIN LATERAL (
+        SELECT format('absences counted here, but attendance belongs to department %s', d.dept) AS problem
+        FROM (SELECT attendance_department(s.student_id, s.course_id) AS dept) d
+        WHERE s.absent_count + s.late_count > 0 AND d.dept IS DISTINCT FROM s.department_id
+    ) misplaced ON TRUE
+    WHERE s.student_id IS NULL OR e.student_id IS NULL
+       OR (s.mark_count, s.mark_sum, s.latest_mark_id, s.latest_mark, s.absent_count, s.late_count, s.failing_grade)
+          IS DISTINCT FROM (e.mark_count, e.mark_sum, e.latest_mark_id, e.latest_mark, e.absent_count, e.late_count, e.failing_grade)
+    ORDER BY 3, 2, 1;
+$$;
+
+
+-- ====================================================================
+-- 5. REPORTS READ THE SUMMARY
+-- ====================================================================
+-- Same signatures as in part 2. A student now appears once per course,
+-- with the average mark, judged against the course's failing_grade.
+
+-- (h) Failing: average below the course's pass mark
+CREATE OR REPLACE FUNCTION get_failing_students()
+RETURNS TABLE(student_name VARCHAR, course_name VARCHAR, mark NUMERIC) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT (s.first_name || ' ' || s.last_name)::VARCHAR, c.name, sm.avg_mark
+    FROM Student_Course_Summary sm
+    JOIN Student s ON s.student_id = sm.student_id
+    JOIN Course c ON c.course_id = sm.course_id AND c.department_id = sm.department_id
+    WHERE sm.status = 'FAIL';
+END;
+$$ LANGUAGE plpgsql;
+
+-- (i) Resit candidates: failing, with an average of at least 5
+CREATE OR REPLACE FUNCTION get_resit_students()
+RETURNS TABLE(student_name VARCHAR, course_name VARCHAR, mark NUMERIC) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT (s.first_name || ' ' || s.last_name)::VARCHAR, c.name, sm.avg_mark
+    FROM Student_Course_Summary sm
+    JOIN Student s ON s.student_id = sm.student_id
+    JOIN Course c ON c.course_id = sm.course_id AND c.department_id = sm.department_id
+    WHERE sm.status = 'FAIL' AND sm.avg_mark >= 5;
+END;
+$$ LANGUAGE plpgsql;
+
+-- (j) Excluded: 3 or more absences / late arrivals in a course
+CREATE OR REPLACE FUNCTION get_excluded_students()
+RETURNS TABLE(student_name VARCHAR, course_name VARCHAR, absence_count BIGINT) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT (s.first_name || ' ' || s.last_name)::VARCHAR, c.name, (sm.absent_count + sm.late_count)::BIGINT
+    FROM Student_Course_Summary sm
+    JOIN Student s ON s.student_id = sm.student_id
+    JOIN Course c ON c.course_id = sm.course_id AND c.department_id = sm.department_id
+    WHERE sm.absent_count + sm.late_count >= 3;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- ====================================================================
+-- 6. INITIAL CONTENT
+-- ====================================================================
+SELECT rebuild_student_course_summary();
+ANALYZE Student_Course_Summary;
@@ -0,0 +1,207 @@
+import time
+
+from instrumentation import STATS
+
+# ====================================================================
+#   KEYSET PAGINATION FOR LARGE TABLES
+# ====================================================================
+# Instead of SELECT * + fetchall() + one tree.insert per row, a tree only
+# ever holds a sliding window of rows. Pages are fetched with keyset
+# pagination on the primary key ("WHERE (pk) > (last seen) ORDER BY pk
+# LIMIT n"), which stays an index range scan however deep the user
+# scrolls, and rows falling far outside the window are dropped again.
+
+
+class KeysetQuery:
+    def __init__(self, columns, table, key, descending=False, where=None, params=()):
+        self.columns = [c.strip() for c in columns.split(",")] if isinstance(columns, str) else list(columns)
+        self.table = table
+        self.key = list(key)
+        self.key_idx = [self.columns.index(k) for k in self.key]
+        self.descending = descending
+        self.where, self.params = where, tuple(params)   # fixed filter ANDed into every page
+
+    def filtered(self, where, params=()):
+        # Same query restricted by an extra condition, e.g. a date range
+        return KeysetQuery(self.columns, self.table, self.key, self.descending, where, params)
+
+    def key_of(self, row):
+        return tuple(row[i] for i in self.key_idx)
+
+    def _order(self, reverse=False):
+        desc = self.descending != reverse
+        return ", ".join(f"{k} DESC" if desc else k for k in self.key)
+
+    def _select(self, where, order, limit):
+        sql = f"SELECT {', '.join(self.columns)} FROM {self.table}"
+        conds = [c for c in (self.where, where) if c]
+        if conds: sql += " WHERE " + " AND ".join(f"({c})" for c in conds)
+        sql += f" ORDER BY {order}"
+        if limit: sql += " LIMIT %s"
+        return sql
+
+    def _after_where(self, reverse):
+        # Row-value comparison so composite keys (e.g. Enrollment) page correctly
+        op = "<" if self.descending != reverse else ">"
+        return f"({', '.join(self.key)}) {op} ({', '.join(['%s'] * len(self.key))})"
+
+    def select_all(self):
+        return self._select(None, self._order(), None), self.params
+
+    def first(self, n):
+        return self._select(None, self._order(), n), self.params + (n,)
+
+    def after(self, key, n):
+        # Rows following `key` in display order
+        return self._select(self._after_where(False), self._order(), n), self.params + tuple(key) + (n,)
+
+    def before(self, key, n):
+        # Rows preceding `key`, nearest first: the caller reverses them back into display order
+        return self._select(self._after_where(True), self._order(reverse=True), n), self.params + tuple(key) + (n,)
+
+
+class TreePager:
+    """Keeps a bounded window of a KeysetQuery in a Treeview and pages as the scrollbar nears either end."""
+
+    def __init__(self, tree, scrollbar, query, submit, page_size=500, max_rows=2000, threshold=0.9, cache=None):
+        self.tree, self.scrollbar, self.query = tree, scrollbar, query
+        self.submit = submit              # submit(work, on_done, on_stop) -> job, see UniversityApp.run_async
+        self.cache = cache                # optional query_cache.QueryCache for the pages
+        self.page_size, self.max_rows, self.threshold = page_size, max_rows, threshold
+        self.items = {}                   # tree item id -> primary key tuple
+        self.iids = {}                    # primary key tuple -> tree item id
+        self.job = None
+        self.has_before = self.has_after = False
+        self.head_stale = False           # refresh_head() was asked for while another page was loading
+        tree.configure(yscrollcommand=self._on_scroll)
+
+    def reload(self):
+        self._fetch("first")
+
+    def patch(self, op, rows):
+        """Applies the rows returned by an INSERT / UPDATE / DELETE ... RETURNING to the window, without a reload."""
+        if self.job is not None:
+            return self.reload()          # a page in flight may predate the write
+        if self.query.where and op != "DELETE":
+            return self.reload()          # whether a changed row still matches the filter is the server's call
+        tree = self.tree
+        anchor = self._top_item()
+        for row in rows:
+            key = self.query.key_of(row)
+            iid = self.iids.get(key)
+            if op == "DELETE":
+                if iid: self._forget(iid); tree.delete(iid)
+            elif iid:
+                tree.item(iid, values=row)   # in place: selection and position are kept
+            elif op == "INSERT":
+                pos = self._position(key)
+                if pos is not None: self._insert(pos, row)
+        self._trim("before")
+        if anchor and tree.exists(anchor):
+            tree.yview_moveto(tree.index(anchor) / max(1, len(tree.get_children())))
+
+    def _position(self, key):
+        # Index where `key` belongs in display order, or None when it lies beyond an edge not loaded yet
+        kids = self.tree.get_children()
+        before = (lambda a, b: a > b) if self.query.descending else (lambda a, b: a < b)
+        lo, hi = 0, len(kids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if before(self.items[kids[mid]], key): lo = mid + 1
+            else: hi = mid
+        if (lo == 0 and self.has_before) or (lo == len(kids) and self.has_after): return None
+        return lo
+
+    def _insert(self, index, row):
+        iid = self.tree.insert("", index, values=row)
+        key = self.query.key_of(row)
+        self.items[iid], self.iids[key] = key, iid
+
+    def _forget(self, iid):
+        self.iids.pop(self.items.pop(iid, None), None)
+
+    def refresh_head(self):
+        # Fetches only rows that now sort before the first one shown (e.g. new entries of a newest-first log)
+        if self.job is not None:
+            self.head_stale = True; return
+        if self.has_before: return        # scrolled away from the head: they arrive when scrolling back up
+        if not self.tree.get_children(): return self.reload()
+        self._fetch("before", follow=True)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.job is not None: return
+        if float(last) >= self.threshold and self.has_after: self._fetch("after")
+        elif float(first) <= 1 - self.threshold and self.has_before: self._fetch("before")
+
+    def _top_item(self):
+        kids = self.tree.get_children()
+        if not kids: return None
+        return kids[min(len(kids) - 1, int(round(float(self.tree.yview()[0]) * len(kids))))]
+
+    def _edge_key(self, last):
+        kids = self.tree.get_children()
+        return self.items[kids[-1 if last else 0]] if kids else None
+
+    def _fetch(self, direction, follow=False):
+        if self.job is not None: self.job.cancel()
+        n = self.page_size
+        if direction == "first": sql, params = self.query.first(n)
+        elif direction == "after": sql, params = self.query.after(self._edge_key(True), n)
+        else: sql, params = self.query.before(self._edge_key(False), n)
+        def work(conn, job):
+            if self.cache is not None: return self.cache.fetch(conn, sql, params)[1]
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            return cur.fetchall()
+        def done(rows):
+            if self.job is not job: return
+            self.job = None
+            started = time.perf_counter()
+            self._apply(direction, rows, follow)
+            STATS.rendered(sql, time.perf_counter() - started, len(rows))
+            self._replay_head()
+        def failed():
+            # Failed or cancelled (e.g. from the tab's busy bar): paging and the head refresh must carry on
+            if self.job is not job: return
+            self.job = None
+            self._replay_head()
+        job = self.submit(work, done, failed)
+        self.job = job
+
+    def _replay_head(self):
+        if self.head_stale:
+            self.head_stale = False
+            self.refresh_head()
+
+    def _apply(self, direction, rows, follow=False):
+        tree = self.tree
+        full = len(rows) == self.page_size
+        if direction == "first":
+            tree.delete(*tree.get_children())
+            self.items.clear(); self.iids.clear()
+            self.has_before, self.has_after = False, full
+            for row in rows: self._insert("end", row)
+            return
+        # Remember the top visible row so the view does not jump when rows are added or dropped above it.
+        # When following the head and the user is at the very top, let the new rows show instead.
+        anchor = None if follow and float(tree.yview()[0]) == 0 else self._top_item()
+        if direction == "after":
+            self.has_after = full
+            for row in rows: self._insert("end", row)
+        else:
+            self.has_before = full
+            for row in rows: self._insert(0, row)
+        self._trim(direction)
+        if anchor and tree.exists(anchor):
+            tree.yview_moveto(tree.index(anchor) / max(1, len(tree.get_children())))
+
+    def _trim(self, direction):
+        # Drop rows from the end we are moving away from so memory stays bounded
+        kids = self.tree.get_children()
+        extra = len(kids) - self.max_rows
+        if extra <= 0: return
+        if direction == "after": drop, self.has_before = kids[:extra], True
+        else: drop, self.has_after = kids[-extra:], True
+        for iid in drop: self._forget(iid)
+        self.tree.delete(*drop)
@@ -0,0 +1,62 @@
+import json
+import select
+import threading
+
+import psycopg2
+
+import db_connection
+
+# ====================================================================
+#   LISTEN/NOTIFY SUBSCRIBER
+# ====================================================================
+# LISTEN needs a long-lived autocommit connection of its own, so this
+# does not use the pool. The thread waits on the socket with select(),
+# hands every notification to `callback(channel, payload)` (called on
+# this thread: GUI code must marshal it to Tk itself) and reconnects
+# after a dropped connection. After a reconnect callback(None, None) is
+# sent, because notifications may have been missed in between.
+
+AUDIT_CHANNEL = "student_audit"
+
+
+def parse_payload(payload):
+    try: return json.loads(payload)
+    except (TypeError, ValueError): return {}
+
+
+class NotifyListener(threading.Thread):
+    def __init__(self, channels, callback, reconnect_delay=5.0, poll_timeout=1.0):
+        super().__init__(name="pg-listener", daemon=True)
+        self.channels, self.callback = list(channels), callback
+        self.reconnect_delay, self.poll_timeout = reconnect_delay, poll_timeout
+        self.connected = False
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        first = True
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**db_connection.connect_params(db_connection.load_config()))
+                conn.autocommit = True
+                cur = conn.cursor()
+                for ch in self.channels: cur.execute(f'LISTEN "{ch}"')
+                self.connected = True
+                if not first: self.callback(None, None)
+                first = False
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], self.poll_timeout) == ([], [], []): continue
+                    conn.poll()
+                    while conn.notifies:
+                        n = conn.notifies.pop(0)
+                        self.callback(n.channel, n.payload)
+            except (psycopg2.Error, OSError):
+                self.connected = False
+                first = False
+                self._stop_event.wait(self.reconnect_delay)
+            finally:
+                if conn is not None and not conn.closed: conn.close()
+        self.connected = False
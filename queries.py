@@ -0,0 +1,191 @@
+import datetime
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from paging import KeysetQuery
+
+# ====================================================================
+#   TABLE VIEWS (paged on their primary key)
+# ====================================================================
+TABLES = {
+    "students": KeysetQuery("student_id, first_name, last_name, academic_group, section", "Student", ["student_id"]),
+    "instructors": KeysetQuery("instructor_id, first_name, last_name, rank, department_id", "Instructor", ["instructor_id"]),
+    "departments": KeysetQuery("department_id, name", "Department", ["department_id"]),
+    "courses": KeysetQuery("course_id, department_id, name", "Course", ["course_id", "department_id"]),
+    "rooms": KeysetQuery("building, roomno, capacity", "Room", ["building", "roomno"]),
+    "reservations": KeysetQuery("reservation_id, building, roomno, instructor_id, course_id, reserv_date, start_time, end_time", "Reservation", ["reservation_id"]),
+    "enrollment": KeysetQuery("student_id, course_id, department_id, enrollment_date", "Enrollment", ["student_id", "course_id", "department_id"]),
+    "marks": KeysetQuery("mark_id, student_id, course_id, mark_value", "Marks", ["mark_id"]),
+    "attendance": KeysetQuery("attendance_id, student_id, course_id, attendance_date, status", "Attendance", ["attendance_id"]),
+    # Newest first: audit_id grows with audit_timestamp, and unlike the timestamp it is unique
+    "audit": KeysetQuery("audit_id, operation_type, audit_timestamp, changed_by, description", "Student_Audit_Log", ["audit_id"], descending=True),
+}
+
+
+def audit_range(date_from=None, date_to=None):
+    # Audit entries between two dates (inclusive, either may be None). The log is
+    # partitioned by month on audit_timestamp, so the bounds let the planner skip
+    # every partition outside the range.
+    conds, params = [], []
+    if date_from: conds.append("audit_timestamp >= %s"); params.append(date_from)
+    if date_to: conds.append("audit_timestamp < %s::date + 1"); params.append(date_to)
+    if not conds: return TABLES["audit"]
+    return TABLES["audit"].filtered(" AND ".join(conds), params)
+
+
+# ====================================================================
+#   ATTENDANCE ROLL CALL
+# ====================================================================
+ATTENDANCE_STATUSES = ["Present", "Absent", "Late", "Excused"]
+
+ROLL_CALL_FILTERS = {"group": "academic_group", "section": "section"}
+
+
+def roll_call_students(conn, by, name):
+    cur = conn.cursor()
+    cur.execute(f"SELECT student_id, first_name, last_name FROM Student WHERE {ROLL_CALL_FILTERS[by]} = %s ORDER BY last_name, first_name, student_id", (name,))
+    return cur.fetchall()
+
+
+def record_roll_call(conn, course_id, attendance_date, roll):
+    # roll: [(student_id, status)]. One multi-row INSERT in one transaction (and one audit trigger firing).
+    # Returns the attendance_id of every row written.
+    rows = [(sid, course_id, attendance_date, status) for sid, status in roll]
+    cur = conn.cursor()
+    ids = execute_values(cur, "INSERT INTO Attendance (student_id, course_id, attendance_date, status) VALUES %s RETURNING attendance_id",
+                         rows, template="(%s::integer, %s::integer, %s::date, %s)", page_size=max(1, len(rows)), fetch=True)
+    conn.commit()
+    return [r[0] for r in ids]
+
+
+# ====================================================================
+#   ROOM RESERVATIONS (see migrations/005_reservation_exclusion.sql)
+# ====================================================================
+class ReservationConflict(Exception):
+    def __init__(self, clashes):
+        # clashes: [(date, conflicting reservation_id)]
+        self.clashes = clashes
+        super().__init__(", ".join(f"{d} (reservation {rid})" for d, rid in clashes) or "room already booked")
+
+
+def find_free_rooms(conn, day, start, end, min_capacity=0):
+    cur = conn.cursor()
+    cur.execute("SELECT building, roomno, capacity FROM find_free_rooms(%s, %s, %s, %s)", (day, start, end, min_capacity))
+    return cur.fetchall()
+
+
+def book_weekly(conn, building, roomno, course_id, department_id, instructor_id, first_day, start, end, weeks=1):
+    # Books the same slot on `weeks` consecutive weeks with one INSERT: either every date is booked or none.
+    # Overlaps are rejected by the exclusion constraint; the clashing dates are then looked up for the message.
+    # Returns the booked rows, with the columns of TABLES["reservations"].
+    days = [first_day + datetime.timedelta(weeks=i) for i in range(weeks)]
+    length = datetime.datetime.combine(first_day, end) - datetime.datetime.combine(first_day, start)
+    hours = max(1, int(length.total_seconds() // 3600))
+    rows = [(building, roomno, course_id, department_id, instructor_id, d, start, end, hours) for d in days]
+    cur = conn.cursor()
+    try:
+        booked = execute_values(cur, f"""INSERT INTO Reservation (building, roomno, course_id, department_id, instructor_id,
+                                                                 reserv_date, start_time, end_time, hours_number)
+                                         VALUES %s RETURNING {', '.join(TABLES["reservations"].columns)}""",
+                                rows, template="(%s, %s, %s::integer, %s::integer, %s::integer, %s::date, %s::time, %s::time, %s)",
+                                page_size=len(rows), fetch=True)
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        if e.pgcode != "23P01": raise
+        cur.execute("""SELECT d::date, R.reservation_id
+                       FROM unnest(%s::date[]) AS d
+                       JOIN Reservation R ON R.building = %s AND R.roomno = %s AND R.reserv_date = d
+                        AND tsrange(R.reserv_date + R.start_time, R.reserv_date + R.end_time) && tsrange(d + %s::time, d + %s::time)
+                       ORDER BY 1, 2""", (days, building, roomno, start, end))
+        clashes = cur.fetchall()
+        conn.rollback()
+        raise ReservationConflict(clashes) from e
+    conn.commit()
+    return booked
+
+
+# ====================================================================
+#   RESULTS PROCESSING (see migrations/001_results_processing.sql)
+# ====================================================================
+RESULT_COLUMNS = ["student_id", "course_id", "department_id", "final_mark", "failing_grade", "status"]
+
+
+# Per-department report queries for batch_runner.py, prepared once per worker ($1 = department_id).
+# Unlike the report functions of part 2 they join Course on its whole key, so a course_id shared by
+# several departments does not repeat rows, and they also return the student and course ids.
+DEPARTMENT_REPORTS = {
+    "results": f"""SELECT {', '.join(RESULT_COLUMNS)} FROM Result_Snapshot
+                   WHERE department_id = $1 ORDER BY course_id, student_id""",
+    # Read from Student_Course_Summary (migrations/006): one row per student and course
+    "failing": """SELECT s.student_id, (s.first_name || ' ' || s.last_name)::VARCHAR AS student_name,
+                         c.course_id, c.name AS course_name, sm.avg_mark AS mark, sm.latest_mark, sm.failing_grade
+                  FROM Student_Course_Summary sm
+                  JOIN Student s ON s.student_id = sm.student_id
+                  JOIN Course c ON c.course_id = sm.course_id AND c.department_id = sm.department_id
+                  WHERE sm.department_id = $1 AND sm.status = 'FAIL'
+                  ORDER BY c.course_id, s.student_id""",
+    "resit": """SELECT s.student_id, (s.first_name || ' ' || s.last_name)::VARCHAR AS student_name,
+                       c.course_id, c.name AS course_name, sm.avg_mark AS mark, sm.latest_mark, sm.failing_grade
+                FROM Student_Course_Summary sm
+                JOIN Student s ON s.student_id = sm.student_id
+                JOIN Course c ON c.course_id = sm.course_id AND c.department_id = sm.department_id
+                WHERE sm.department_id = $1 AND sm.status = 'FAIL' AND sm.avg_mark >= 5
+                ORDER BY c.course_id, s.student_id""",
+    "excluded": """SELECT s.student_id, (s.first_name || ' ' || s.last_name)::VARCHAR AS student_name,
+                          c.course_id, c.name AS course_name, sm.absent_count, sm.late_count,
+                          sm.absent_count + sm.late_count AS absence_count
+                   FROM Student_Course_Summary sm
+                   JOIN Student s ON s.student_id = sm.student_id
+                   JOIN Course c ON c.course_id = sm.course_id AND c.department_id = sm.department_id
+                   WHERE sm.department_id = $1 AND sm.absent_count + sm.late_count >= 3
+                   ORDER BY c.course_id, s.student_id""",
+}
+
+
+def refresh_results(conn, full=False):
+    # Recomputes only the (student, course, department) keys whose marks changed since the last run
+    cur = conn.cursor()
+    cur.execute("SELECT refresh_results(%s)", (full,))
+    n = cur.fetchone()[0]
+    conn.commit()
+    return n
+
+
+def rebuild_summary(conn):
+    # Recomputes Student_Course_Summary from Marks / Attendance; returns the number of rows
+    cur = conn.cursor()
+    cur.execute("SELECT rebuild_student_course_summary()")
+    n = cur.fetchone()[0]
+    conn.commit()
+    return n
+
+
+def check_summary(conn):
+    # (student_id, course_id, department_id, problem) for every summary row that disagrees with the raw tables
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM check_student_course_summary()")
+    rows = cur.fetchall()
+    conn.rollback()
+    return rows
+
+
+def results_select(department_id=None):
+    # (sql, params) of the results snapshot, as shown in Results Processing
+    where = "WHERE department_id = %s" if department_id is not None else ""
+    return (f"SELECT {', '.join(RESULT_COLUMNS)} FROM Result_Snapshot {where} ORDER BY department_id, course_id, student_id",
+            (department_id,) if department_id is not None else None)
+
+
+def iter_results(conn, department_id=None, chunk=2000):
+    # Streams the snapshot through a server-side (named) cursor, `chunk` rows at a time
+    cur = conn.cursor(name="results_stream")
+    cur.itersize = chunk
+    cur.execute(*results_select(department_id))
+    try:
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows: break
+            yield rows
+    finally:
+        cur.close()
@@ -0,0 +1,144 @@
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+# ====================================================================
+#   QUERY RESULT CACHE
+# ====================================================================
+# Results of read queries (report buttons, table pages) are kept in an
+# LRU keyed by (SQL text, parameters) and bounded by an estimate of their
+# memory use. Every entry remembers the tables it read, so a write only
+# evicts the entries that read one of the written tables. Writes made by
+# other clients arrive through the audit triggers' notifications (see
+# pg_listener.py); for tables without such triggers, max_age bounds how
+# long another client's change can stay unseen.
+
+# Tables read by the report functions of part 2 (EXPLAIN cannot tell us)
+FUNCTION_TABLES = {
+    "get_students_by_group": {"student"},
+    "get_students_by_section": {"student"},
+    "get_failing_students": {"student_course_summary", "student", "course"},
+    "get_resit_students": {"student_course_summary", "student", "course"},
+    "get_excluded_students": {"student_course_summary", "student", "course"},
+}
+
+# Tables written by triggers as a side effect of writing the key table
+TRIGGER_WRITES = {
+    "student": {"student_audit_log"},
+    "marks": {"student_audit_log", "result_pending", "student_course_summary"},
+    "attendance": {"student_audit_log", "student_course_summary"},
+    "enrollment": {"student_course_summary"},
+    "course": {"result_pending", "student_course_summary"},
+}
+
+_READ_RE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w.]*)\s*(\()?", re.IGNORECASE)
+_WRITE_RE = re.compile(r"^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+
+def tables_read(sql):
+    # Lower-case table names a SELECT reads, or None when that cannot be told (then it is not cached)
+    tables = set()
+    for name, call in _READ_RE.findall(sql):
+        name = name.lower().rsplit(".", 1)[-1]
+        if name in FUNCTION_TABLES: tables |= FUNCTION_TABLES[name]
+        elif call: return None
+        else: tables.add(name)
+    return tables or None
+
+
+def tables_written(sql):
+    # Tables a write statement changes, including trigger side effects; None when unknown
+    m = _WRITE_RE.match(sql)
+    if not m: return None
+    return with_triggers({m.group(1).lower().rsplit(".", 1)[-1]})
+
+
+def with_triggers(tables):
+    tables = set(tables)
+    for t in list(tables): tables |= TRIGGER_WRITES.get(t, set())
+    return tables
+
+
+def _sizeof(obj):
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        size += sum(_sizeof(v) for v in obj)
+    return size
+
+
+class QueryCache:
+    def __init__(self, max_bytes=32 * 1048576, max_age=300.0):
+        self.max_bytes, self.max_age = max_bytes, max_age
+        self._entries = OrderedDict()   # key -> (tables, value, size, stored at)
+        self._bytes = 0
+        self._epoch = 0                 # bumped by every invalidation
+        self._invalidated = {}          # table -> epoch of its last invalidation
+        self._cleared = -1              # epoch of the last full invalidation
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def key(sql, params):
+        return sql, tuple(tuple(p) if isinstance(p, list) else p for p in params or ())
+
+    def get(self, sql, params=None):
+        """Returns (value or None, epoch); pass the epoch back to put()."""
+        key = self.key(sql, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[3] > self.max_age:
+                self._remove(key); entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None, self._epoch
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1], self._epoch
+
+    def put(self, sql, params, tables, value, epoch):
+        # Skipped when one of the tables was invalidated while the query ran: the result may predate the write
+        size = _sizeof(value)
+        if size > self.max_bytes: return
+        key = self.key(sql, params)
+        with self._lock:
+            if self._cleared > epoch or any(self._invalidated.get(t, -1) > epoch for t in tables): return
+            if key in self._entries: self._remove(key)
+            self._entries[key] = (frozenset(tables), value, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def fetch(self, conn, sql, params=None):
+        """Runs a read through the cache: returns (column names, rows)."""
+        tables = tables_read(sql)
+        if tables is not None:
+            value, epoch = self.get(sql, params)
+            if value is not None: return value
+        cur = conn.cursor()
+        cur.execute(sql, params or None)
+        value = ([d[0] for d in cur.description], cur.fetchall())
+        if tables is not None: self.put(sql, params, tables, value, epoch)
+        return value
+
+    def invalidate(self, tables=None):
+        # Drops every entry that read one of `tables` (all entries when None)
+        with self._lock:
+            self._epoch += 1
+            self.stats["invalidations"] += 1
+            if tables is None:
+                self._entries.clear(); self._bytes = 0
+                self._cleared = self._epoch
+                return
+            tables = {t.lower() for t in tables}
+            for t in tables: self._invalidated[t] = self._epoch
+            for key in [k for k, entry in self._entries.items() if entry[0] & tables]: self._remove(key)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[2]
@@ -0,0 +1,134 @@
+import queue
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+import psycopg2.extensions
+
+import db_connection
+
+# ====================================================================
+#   BACKGROUND QUERY EXECUTION
+# ====================================================================
+# Database work runs on a small thread pool, each job on its own pooled
+# connection. Tk is not thread-safe, so workers never touch widgets:
+# they post (job, event, payload) messages on a queue which the Tk main
+# loop drains every few milliseconds via root.after().
+
+_ids = itertools.count(1)
+
+
+class Cancelled(Exception):
+    pass
+
+
+class ConnectError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, runner, handlers):
+        self.id = next(_ids)
+        self.runner = runner
+        self.handlers = handlers      # (on_done, on_error, on_progress)
+        self.cancelled = False
+        self.conn = None
+        self.future = None
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        # Safe from any thread: flags the job and asks the server to abort the running statement.
+        # The lock is held throughout so the connection cannot go back to the pool (and on to another job) meanwhile.
+        with self._lock:
+            self.cancelled = True
+            conn = self.conn
+            if conn is not None and not conn.closed:
+                try: conn.cancel()
+                except psycopg2.Error: pass
+
+    def check(self):
+        # Long-running work calls this between steps to stop early once cancelled
+        if self.cancelled: raise Cancelled()
+
+    def progress(self, value):
+        self.runner._post(self, "progress", value)
+
+
+class QueryRunner:
+    def __init__(self, root, workers=4, poll_ms=25):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.active = {}
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-worker")
+        self._closed = False
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, work, on_done=None, on_error=None, on_progress=None):
+        """Run work(conn, job) on a worker; handlers are called later on the Tk thread."""
+        job = Job(self, (on_done, on_error, on_progress))
+        self.active[job.id] = job
+        job.future = self._executor.submit(self._run, job, work)
+        return job
+
+    def call_soon(self, fn, *args):
+        # Thread-safe: runs fn(*args) on the Tk thread at the next poll
+        self._queue.put((None, "call", (fn, args)))
+
+    def shutdown(self):
+        self._closed = True
+        for job in list(self.active.values()):
+            job.cancel()
+            job.future.cancel()       # still queued: never started (shutdown's cancel_futures needs Python 3.9)
+        self._executor.shutdown(wait=False)
+
+    # --- worker side ---
+    def _run(self, job, work):
+        if job.cancelled:
+            self._post(job, "error", Cancelled()); return
+        pool = db_connection.get_pool()
+        try:
+            conn = pool.getconn()
+        except Exception as e:
+            self._post(job, "error", ConnectError(str(e))); return
+        with job._lock: job.conn = conn
+        try:
+            job.check()
+            result = work(conn, job)
+            self._post(job, "done", result)
+        except psycopg2.extensions.QueryCanceledError as e:
+            # Also raised by statement_timeout, so only report a cancel when the user asked for one
+            self._post(job, "error", Cancelled() if job.cancelled else e)
+        except Exception as e:
+            self._post(job, "error", e)
+        finally:
+            # Cleared before the connection is returned, so a late cancel() cannot reach the next job using it
+            with job._lock: job.conn = None
+            pool.putconn(conn)
+
+    def _post(self, job, event, payload):
+        self._queue.put((job, event, payload))
+
+    # --- Tk side ---
+    def _poll(self):
+        try:
+            while True:
+                job, event, payload = self._queue.get_nowait()
+                if event == "call":
+                    payload[0](*payload[1])
+                    continue
+                on_done, on_error, on_progress = job.handlers
+                if event == "progress":
+                    if on_progress and not job.cancelled: on_progress(payload)
+                    continue
+                self.active.pop(job.id, None)
+                if event == "done" and job.cancelled:
+                    # Cancelled after the work finished but before its result was handed over
+                    event, payload = "error", Cancelled()
+                if event == "done" and on_done: on_done(payload)
+                elif event == "error" and on_error: on_error(payload)
+        except queue.Empty:
+            pass
+        finally:
+            if not self._closed: self.root.after(self.poll_ms, self._poll)